@@ -1,9 +1,26 @@
 import streamlit as st
 import pandas as pd
+import hashlib
+import time
+import weakref
+from io import BytesIO
+from datetime import datetime
+from functools import partial
 from utils.data_processor import DataProcessor
-from utils.dashboard_builder import DashboardBuilder
-from utils.chatbot import DataChatbot
-from utils.report_generator import ReportGenerator
+
+# Copy-on-Write lets cleaned/exported frames share memory with the original
+# until one of them is modified (always on from pandas 3.0)
+if int(pd.__version__.split('.')[0]) < 3:
+    pd.set_option("mode.copy_on_write", True)
+
+# Maps the fill method selectbox labels to handle_missing_values types
+_FILL_METHOD_MAP = {
+    "Mean": "mean",
+    "Median": "median",
+    "Mode": "mode",
+    "Custom Value": "custom",
+    "Drop Rows": "drop"
+}
 
 # Page configuration
 st.set_page_config(
@@ -29,9 +46,92 @@ if 'api_keys_configured' not in st.session_state:
 
 # Initialize components
 data_processor = DataProcessor()
-dashboard_builder = DashboardBuilder()
-chatbot = DataChatbot()
-report_generator = ReportGenerator()
+
+def render_missing_value_handler(df, missing_data, columns_with_missing, key_prefix):
+    """Render the per-column missing value controls and apply them to the main dataset"""
+    with st.expander("🔧 Handle Missing Values", expanded=False):
+        st.markdown("Configure how to handle missing values for each column:")
+        
+        fill_config = {}
+        
+        for col in columns_with_missing:
+            st.markdown(f"**{col}** ({missing_data[col]} missing values)")
+            
+            col1, col2 = st.columns(2)
+            
+            with col1:
+                fill_method = st.selectbox(
+                    "Fill method",
+                    ["Skip", "Mean", "Median", "Mode", "Custom Value", "Drop Rows"],
+                    key=f"{key_prefix}fill_method_{col}"
+                )
+            
+            with col2:
+                custom_value = ""
+                if fill_method == "Custom Value":
+                    custom_value = st.text_input(
+                        "Custom value",
+                        key=f"{key_prefix}custom_value_{col}"
+                    )
+            
+            if fill_method != "Skip":
+                fill_config[col] = {
+                    'type': _FILL_METHOD_MAP.get(fill_method, fill_method.lower()),
+                    'value': custom_value
+                }
+        
+        if st.button("Apply Missing Value Handling", key=f"{key_prefix}apply_missing_values") and fill_config:
+            try:
+                cleaned_data = data_processor.handle_missing_values(df, fill_config)
+                st.session_state.data = cleaned_data
+                st.session_state.data_cleaned = True  # Flag to show export options
+                st.success("✅ Missing values handled successfully!")
+                st.rerun()
+            except Exception as e:
+                st.error(f"❌ Error handling missing values: {str(e)}")
+    
+    # Show updated missing values status in real-time
+    st.markdown("---")
+    st.markdown("**Current Missing Values Status:**")
+    for col in columns_with_missing:
+        current_missing = missing_data[col]
+        if current_missing == 0:
+            st.success(f"✅ {col}: No missing values")
+        else:
+            st.info(f"ℹ️ {col}: {current_missing} missing values remaining")
+
+# How long a key test result is reused before probing the API again (seconds)
+_KEY_TEST_TTL = {True: 300, False: 30}
+
+def test_api_key(provider, api_key, probe):
+    """Run an API key probe, reusing a recent result for the same key"""
+    results = st.session_state.setdefault('_api_key_tests', {})
+    cache_key = (provider, hashlib.sha256(api_key.encode()).hexdigest()[:16])
+    
+    cached = results.get(cache_key)
+    if cached is not None and time.time() - cached[2] < _KEY_TEST_TTL[cached[0]]:
+        return cached[0], cached[1]
+    
+    try:
+        probe(api_key)
+        ok, message = True, ""
+    except Exception as e:
+        ok, message = False, str(e)
+    results[cache_key] = (ok, message, time.time())
+    return ok, message
+
+def probe_openai(api_key):
+    """Validate an OpenAI key by fetching a single model"""
+    import openai
+    client = openai.OpenAI(api_key=api_key)
+    client.models.retrieve("gpt-4o-mini")
+
+def probe_gemini(api_key):
+    """Validate a Gemini key by fetching a single model"""
+    # Probe through the chat's shared client so its connection is already
+    # open when the first question is asked
+    from utils.chatbot import get_gemini_client
+    get_gemini_client(api_key).models.get(model="gemini-2.5-flash")
 
 # Check if API keys are configured, if not show setup screen
 import os
@@ -107,8 +207,7 @@ if page == "Data Upload":
             
             if file_extension in ['xlsx', 'xls']:
                 # Show Excel file information
-                excel_file = pd.ExcelFile(uploaded_file)
-                sheet_names = excel_file.sheet_names
+                sheet_names = data_processor.get_sheet_names(uploaded_file)
                 
                 if len(sheet_names) > 1:
                     st.info(f"📊 Excel file contains {len(sheet_names)} sheets: {', '.join(sheet_names)}")
@@ -120,14 +219,10 @@ if page == "Data Upload":
                     )
                     
                     # Load selected sheet
-                    uploaded_file.seek(0)
-                    data = pd.read_excel(uploaded_file, sheet_name=selected_sheet)
+                    data = data_processor.load_file(uploaded_file, sheet_name=selected_sheet)
                 else:
                     # Single sheet Excel file
-                    data = pd.read_excel(uploaded_file)
-                    
-                # Clean the data
-                data = data_processor._clean_data(data)
+                    data = data_processor.load_file(uploaded_file)
             else:
                 # Process CSV file
                 data = data_processor.load_file(uploaded_file)
@@ -145,90 +240,33 @@ if page == "Data Upload":
             st.dataframe(data.head(10), use_container_width=True)
             
             # Data summary
+            frame_summary = data_processor.get_frame_summary(data)
             col1, col2 = st.columns(2)
             
             with col1:
                 st.subheader("Data Info")
                 st.write(f"**Rows:** {data.shape[0]}")
                 st.write(f"**Columns:** {data.shape[1]}")
-                st.write(f"**Memory Usage:** {data.memory_usage(deep=True).sum() / 1024**2:.2f} MB")
+                st.write(f"**Memory Usage:** {frame_summary['memory_mb']:.2f} MB")
             
             with col2:
                 st.subheader("Column Types")
-                st.write(data.dtypes.to_frame('Data Type'))
+                st.dataframe(frame_summary['dtypes'].to_frame('Data Type'), use_container_width=True)
             
             # Data quality check
             st.subheader("Data Quality")
-            missing_data = data.isnull().sum()
-            if missing_data.sum() > 0:
+            missing_data = frame_summary['missing']
+            columns_with_missing = missing_data[missing_data > 0].index.tolist()
+            if frame_summary['total_missing'] > 0:
                 st.warning("⚠️ Missing values detected:")
-                st.write(missing_data[missing_data > 0])
+                st.write(missing_data[columns_with_missing])
                 
-                # Missing values handler
-                with st.expander("🔧 Handle Missing Values", expanded=False):
-                    st.markdown("Configure how to handle missing values for each column:")
-                    
-                    fill_config = {}
-                    columns_with_missing = missing_data[missing_data > 0].index.tolist()
-                    
-                    for col in columns_with_missing:
-                        st.markdown(f"**{col}** ({missing_data[col]} missing values)")
-                        
-                        col1, col2 = st.columns(2)
-                        
-                        with col1:
-                            fill_method = st.selectbox(
-                                "Fill method",
-                                ["Skip", "Mean", "Median", "Mode", "Custom Value", "Drop Rows"],
-                                key=f"fill_method_{col}"
-                            )
-                        
-                        with col2:
-                            custom_value = ""
-                            if fill_method == "Custom Value":
-                                custom_value = st.text_input(
-                                    "Custom value",
-                                    key=f"custom_value_{col}"
-                                )
-                        
-                        if fill_method != "Skip":
-                            # Map fill method to proper type
-                            method_map = {
-                                "Mean": "mean",
-                                "Median": "median", 
-                                "Mode": "mode",
-                                "Custom Value": "custom",
-                                "Drop Rows": "drop"
-                            }
-                            fill_config[col] = {
-                                'type': method_map.get(fill_method, fill_method.lower()),
-                                'value': custom_value
-                            }
-                    
-                    if st.button("Apply Missing Value Handling") and fill_config:
-                        try:
-                            cleaned_data = data_processor.handle_missing_values(data, fill_config)
-                            st.session_state.data = cleaned_data
-                            st.session_state.data_cleaned = True  # Flag to show export options
-                            st.success("✅ Missing values handled successfully!")
-                            st.rerun()
-                        except Exception as e:
-                            st.error(f"❌ Error handling missing values: {str(e)}")
-                
-                # Show updated missing values status in real-time
-                st.markdown("---")
-                st.markdown("**Current Missing Values Status:**")
-                for col in columns_with_missing:
-                    current_missing = data[col].isnull().sum()
-                    if current_missing == 0:
-                        st.success(f"✅ {col}: No missing values")
-                    else:
-                        st.info(f"ℹ️ {col}: {current_missing} missing values remaining")
+                render_missing_value_handler(data, missing_data, columns_with_missing, key_prefix="")
             else:
                 st.success("✅ No missing values found")
             
             # Export section for processed data (appears after initial processing or cleaning)
-            current_missing_total = data.isnull().sum().sum()
+            current_missing_total = frame_summary['total_missing']
             if st.session_state.get('data_cleaned', False) or current_missing_total == 0:
                 st.markdown("---")
                 st.subheader("📤 Export Processed Data")
@@ -237,32 +275,22 @@ if page == "Data Upload":
                 col1, col2, col3 = st.columns(3)
                 
                 with col1:
-                    if st.button("📊 Export as CSV", key="export_processed_csv"):
-                        try:
-                            from io import BytesIO
-                            from datetime import datetime
-                            
-                            csv_buffer = BytesIO()
-                            data.to_csv(csv_buffer, index=False)
-                            csv_buffer.seek(0)
-                            
-                            st.download_button(
-                                label="⬇️ Download Processed CSV",
-                                data=csv_buffer.getvalue(),
-                                file_name=f"processed_data_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                                mime="text/csv",
-                                key="download_processed_csv"
-                            )
-                            st.success("✅ CSV export ready!")
-                        except Exception as e:
-                            st.error(f"❌ Error exporting CSV: {str(e)}")
+                    try:
+                        # Passing a callable defers serialization until the button is
+                        # clicked and runs it off the script thread
+                        st.download_button(
+                            label="📊 Export as CSV",
+                            data=partial(data_processor.to_csv_bytes, data),
+                            file_name=f"processed_data_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+                            mime="text/csv",
+                            key="download_processed_csv"
+                        )
+                    except Exception as e:
+                        st.error(f"❌ Error exporting CSV: {str(e)}")
                 
                 with col2:
                     if st.button("📋 Export as Excel", key="export_processed_excel"):
                         try:
-                            from io import BytesIO
-                            from datetime import datetime
-                            
                             # Create Excel file with proper formatting
                             excel_buffer = BytesIO()
                             
@@ -276,7 +304,7 @@ if page == "Data Upload":
                                     'Value': [
                                         data.shape[0],
                                         data.shape[1], 
-                                        data.isnull().sum().sum(),
+                                        frame_summary['total_missing'],
                                         datetime.now().strftime('%Y-%m-%d %H:%M:%S')
                                     ]
                                 })
@@ -295,13 +323,9 @@ if page == "Data Upload":
                         except Exception as e:
                             st.error(f"❌ Error exporting Excel: {str(e)}")
                             # Fallback to CSV
-                            csv_buffer = BytesIO()
-                            data.to_csv(csv_buffer, index=False)
-                            csv_buffer.seek(0)
-                            
                             st.download_button(
                                 label="⬇️ Download as CSV (Fallback)",
-                                data=csv_buffer.getvalue(),
+                                data=partial(data_processor.to_csv_bytes, data),
                                 file_name=f"processed_data_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
                                 mime="text/csv",
                                 key="download_processed_csv_fallback"
@@ -324,107 +348,39 @@ if page == "Data Upload":
         st.subheader("🔧 Data Cleaning")
         
         current_data = st.session_state.data
-        missing_data = current_data.isnull().sum()
+        current_summary = data_processor.get_frame_summary(current_data)
+        missing_data = current_summary['missing']
+        columns_with_missing = missing_data[missing_data > 0].index.tolist()
         
-        if missing_data.sum() > 0:
-            st.warning(f"⚠️ {missing_data.sum()} missing values found across {len(missing_data[missing_data > 0])} columns")
+        if current_summary['total_missing'] > 0:
+            st.warning(f"⚠️ {current_summary['total_missing']} missing values found across {len(columns_with_missing)} columns")
             
-            with st.expander("Handle Missing Values", expanded=False):
-                st.markdown("Configure how to handle missing values for each column:")
-                
-                fill_config = {}
-                columns_with_missing = missing_data[missing_data > 0].index.tolist()
-                
-                for col in columns_with_missing:
-                    st.markdown(f"**{col}** ({missing_data[col]} missing values)")
-                    
-                    col1, col2 = st.columns(2)
-                    
-                    with col1:
-                        fill_method = st.selectbox(
-                            "Fill method",
-                            ["Skip", "Mean", "Median", "Mode", "Custom Value", "Drop Rows"],
-                            key=f"existing_fill_method_{col}"
-                        )
-                    
-                    with col2:
-                        custom_value = ""
-                        if fill_method == "Custom Value":
-                            custom_value = st.text_input(
-                                "Custom value",
-                                key=f"existing_custom_value_{col}"
-                            )
-                    
-                    if fill_method != "Skip":
-                        # Map fill method to proper type
-                        method_map = {
-                            "Mean": "mean",
-                            "Median": "median", 
-                            "Mode": "mode",
-                            "Custom Value": "custom",
-                            "Drop Rows": "drop"
-                        }
-                        fill_config[col] = {
-                            'type': method_map.get(fill_method, fill_method.lower()),
-                            'value': custom_value
-                        }
-                
-                if st.button("Apply Missing Value Handling", key="existing_data_cleaning") and fill_config:
-                    try:
-                        cleaned_data = data_processor.handle_missing_values(current_data, fill_config)
-                        st.session_state.data = cleaned_data
-                        st.session_state.data_cleaned = True  # Flag to show export options
-                        st.success("✅ Missing values handled successfully!")
-                        st.rerun()
-                    except Exception as e:
-                        st.error(f"❌ Error handling missing values: {str(e)}")
-                
-                # Show updated missing values status in real-time
-                st.markdown("---")
-                st.markdown("**Current Missing Values Status:**")
-                for col in columns_with_missing:
-                    current_missing = current_data[col].isnull().sum()
-                    if current_missing == 0:
-                        st.success(f"✅ {col}: No missing values")
-                    else:
-                        st.info(f"ℹ️ {col}: {current_missing} missing values remaining")
+            render_missing_value_handler(current_data, missing_data, columns_with_missing, key_prefix="existing_")
         else:
             st.success("✅ No missing values found in current data")
         
         # Export cleaned data section
-        if st.session_state.get('data_cleaned', False) or missing_data.sum() == 0:
+        if st.session_state.get('data_cleaned', False) or current_summary['total_missing'] == 0:
             st.markdown("---")
             st.subheader("📤 Export Cleaned Data")
             
             col1, col2, col3 = st.columns(3)
             
             with col1:
-                if st.button("📊 Export as CSV", key="export_csv_cleaned"):
-                    try:
-                        from io import BytesIO
-                        from datetime import datetime
-                        
-                        csv_buffer = BytesIO()
-                        current_data.to_csv(csv_buffer, index=False)
-                        csv_buffer.seek(0)
-                        
-                        st.download_button(
-                            label="⬇️ Download Cleaned CSV",
-                            data=csv_buffer.getvalue(),
-                            file_name=f"cleaned_data_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                            mime="text/csv",
-                            key="download_csv_cleaned"
-                        )
-                        st.success("✅ CSV export ready!")
-                    except Exception as e:
-                        st.error(f"❌ Error exporting CSV: {str(e)}")
+                try:
+                    st.download_button(
+                        label="📊 Export as CSV",
+                        data=partial(data_processor.to_csv_bytes, current_data),
+                        file_name=f"cleaned_data_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+                        mime="text/csv",
+                        key="download_csv_cleaned"
+                    )
+                except Exception as e:
+                    st.error(f"❌ Error exporting CSV: {str(e)}")
             
             with col2:
                 if st.button("📋 Export as Excel", key="export_excel_cleaned"):
                     try:
-                        from io import BytesIO
-                        from datetime import datetime
-                        
                         # Create Excel file with proper formatting
                         excel_buffer = BytesIO()
                         
@@ -438,7 +394,7 @@ if page == "Data Upload":
                                 'Value': [
                                     current_data.shape[0],
                                     current_data.shape[1], 
-                                    current_data.isnull().sum().sum(),
+                                    current_summary['total_missing'],
                                     datetime.now().strftime('%Y-%m-%d %H:%M:%S')
                                 ]
                             })
@@ -457,13 +413,9 @@ if page == "Data Upload":
                     except Exception as e:
                         st.error(f"❌ Error exporting Excel: {str(e)}")
                         # Fallback to CSV
-                        csv_buffer = BytesIO()
-                        current_data.to_csv(csv_buffer, index=False)
-                        csv_buffer.seek(0)
-                        
                         st.download_button(
                             label="⬇️ Download as CSV (Fallback)",
-                            data=csv_buffer.getvalue(),
+                            data=partial(data_processor.to_csv_bytes, current_data),
                             file_name=f"cleaned_data_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
                             mime="text/csv",
                             key="download_csv_fallback_cleaned"
@@ -474,7 +426,7 @@ if page == "Data Upload":
                     st.markdown("**Cleaned Data Summary:**")
                     st.write(f"**Rows:** {current_data.shape[0]:,}")
                     st.write(f"**Columns:** {current_data.shape[1]}")
-                    total_missing = current_data.isnull().sum().sum()
+                    total_missing = current_summary['total_missing']
                     st.write(f"**Missing Values:** {total_missing:,}")
                     
                     if total_missing == 0:
@@ -484,7 +436,7 @@ if page == "Data Upload":
                     
                     # Show data types
                     st.markdown("**Data Types:**")
-                    st.write(current_data.dtypes.to_frame('Type'))
+                    st.dataframe(current_summary['dtypes'].to_frame('Type'), use_container_width=True)
 
 # Data Cleaning Page
 elif page == "Data Cleaning":
@@ -497,7 +449,7 @@ elif page == "Data Cleaning":
         
         # Initialize session state for cleaned data if not exists
         if 'cleaned_data' not in st.session_state:
-            st.session_state.cleaned_data = data.copy()
+            st.session_state.cleaned_data = data
         
         # Tabs for different operations
         tab1, tab2, tab3, tab4, tab5 = st.tabs([
@@ -559,59 +511,29 @@ elif page == "Data Cleaning":
                                         key=f"custom_{col}"
                                     )
                             
-                            # Apply immediately button for each column
-                            if st.button(f"Apply to {col}", key=f"apply_{col}"):
-                                if fill_method != "Skip":
-                                    method_map = {
-                                        "Mean": "mean",
-                                        "Median": "median", 
-                                        "Mode": "mode",
-                                        "Custom Value": "custom",
-                                        "Drop Rows": "drop"
-                                    }
-                                    single_config = {
-                                        col: {
-                                            'type': method_map.get(fill_method, fill_method.lower()),
-                                            'value': custom_value
-                                        }
-                                    }
-                                    try:
-                                        st.session_state.cleaned_data = data_processor.handle_missing_values(
-                                            st.session_state.cleaned_data, single_config
-                                        )
-                                        st.success(f"✅ Applied {fill_method} to {col}!")
-                                        st.rerun()
-                                    except Exception as e:
-                                        st.error(f"❌ Error: {str(e)}")
+                            if fill_method != "Skip":
+                                fill_config[col] = {
+                                    'type': _FILL_METHOD_MAP.get(fill_method, fill_method.lower()),
+                                    'value': custom_value
+                                }
                 
-                # Apply all missing value treatments
+                # Apply all missing value treatments in a single pass over the data
                 st.write("**Apply All Treatments:**")
                 if st.button("🚀 Apply All Missing Value Treatments", type="primary"):
-                    all_config = {}
-                    for col, info in missing_summary.items():
-                        if info['has_missing']:
-                            method_key = f"method_{col}"
-                            custom_key = f"custom_{col}"
-                            if method_key in st.session_state:
-                                fill_method = st.session_state[method_key]
-                                if fill_method != "Skip":
-                                    method_map = {
-                                        "Mean": "mean",
-                                        "Median": "median", 
-                                        "Mode": "mode",
-                                        "Custom Value": "custom",
-                                        "Drop Rows": "drop"
-                                    }
-                                    all_config[col] = {
-                                        'type': method_map.get(fill_method, fill_method.lower()),
-                                        'value': st.session_state.get(custom_key, "")
-                                    }
-                    
-                    if all_config:
+                    # Re-applying the last treatment to the frame it produced changes
+                    # nothing, so skip the copy and the rerun
+                    last_fill = st.session_state.get('_last_fill')
+                    if not fill_config:
+                        st.info("ℹ️ No treatments selected")
+                    elif (last_fill is not None and last_fill[0]() is st.session_state.cleaned_data
+                            and last_fill[1] == fill_config):
+                        st.info("ℹ️ These treatments are already applied")
+                    else:
                         try:
                             st.session_state.cleaned_data = data_processor.handle_missing_values(
-                                st.session_state.cleaned_data, all_config
+                                st.session_state.cleaned_data, fill_config
                             )
+                            st.session_state['_last_fill'] = (weakref.ref(st.session_state.cleaned_data), fill_config)
                             st.success("✅ All missing value treatments applied!")
                             st.rerun()
                         except Exception as e:
@@ -703,28 +625,19 @@ elif page == "Data Cleaning":
             col1, col2 = st.columns(2)
             
             with col1:
-                if st.button("📊 Export as CSV"):
-                    try:
-                        from io import BytesIO
-                        from datetime import datetime
-                        
-                        csv_buffer = BytesIO()
-                        st.session_state.cleaned_data.to_csv(csv_buffer, index=False)
-                        csv_buffer.seek(0)
-                        
-                        st.download_button(
-                            label="⬇️ Download Cleaned CSV",
-                            data=csv_buffer.getvalue(),
-                            file_name=f"cleaned_data_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                            mime="text/csv"
-                        )
-                        st.success("✅ CSV export ready!")
-                    except Exception as e:
-                        st.error(f"❌ Error exporting CSV: {str(e)}")
+                try:
+                    st.download_button(
+                        label="📊 Export as CSV",
+                        data=partial(data_processor.to_csv_bytes, st.session_state.cleaned_data),
+                        file_name=f"cleaned_data_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+                        mime="text/csv"
+                    )
+                except Exception as e:
+                    st.error(f"❌ Error exporting CSV: {str(e)}")
             
             with col2:
                 if st.button("💾 Update Main Dataset"):
-                    st.session_state.data = st.session_state.cleaned_data.copy()
+                    st.session_state.data = st.session_state.cleaned_data
                     st.success("✅ Main dataset updated with cleaned data!")
                     st.info("You can now use the cleaned data in Dashboard Builder and AI Chat.")
         
@@ -737,11 +650,10 @@ elif page == "Data Cleaning":
             env_openai = os.getenv('OPENAI_API_KEY', '')
             env_gemini = os.getenv('GEMINI_API_KEY', '')
             
-            # OpenAI Configuration
-            st.write("**OpenAI Configuration:**")
-            col1, col2 = st.columns([3, 1])
-            
-            with col1:
+            # Keys are committed together on submit rather than on every edit
+            with st.form("ai_keys_form"):
+                # OpenAI Configuration
+                st.write("**OpenAI Configuration:**")
                 if env_openai:
                     st.info("🔑 OpenAI API key is already set in environment variables.")
                     st.write("Current status: ✅ Available")
@@ -753,37 +665,11 @@ elif page == "Data Cleaning":
                         help="Enter your OpenAI API key to enable GPT-powered features",
                         placeholder="sk-..."
                     )
-                    
-                    if openai_key != st.session_state.user_openai_key:
-                        st.session_state.user_openai_key = openai_key
-                    
-                    if st.session_state.user_openai_key:
-                        st.success("✅ OpenAI key configured (session only)")
-                    else:
-                        st.warning("⚠️ No OpenAI key provided")
-            
-            with col2:
-                if st.button("Test OpenAI"):
-                    try:
-                        import openai
-                        api_key = env_openai or st.session_state.user_openai_key
-                        if api_key:
-                            # Test with a simple API call
-                            client = openai.OpenAI(api_key=api_key)
-                            response = client.models.list()
-                            st.success("✅ OpenAI connection successful!")
-                        else:
-                            st.error("❌ No API key provided")
-                    except Exception as e:
-                        st.error(f"❌ OpenAI test failed: {str(e)}")
-            
-            st.markdown("---")
-            
-            # Gemini Configuration
-            st.write("**Google Gemini Configuration:**")
-            col1, col2 = st.columns([3, 1])
-            
-            with col1:
+                
+                st.markdown("---")
+                
+                # Gemini Configuration
+                st.write("**Google Gemini Configuration:**")
                 if env_gemini:
                     st.info("🔑 Gemini API key is already set in environment variables.")
                     st.write("Current status: ✅ Available")
@@ -795,29 +681,50 @@ elif page == "Data Cleaning":
                         help="Enter your Google Gemini API key to enable Gemini-powered features",
                         placeholder="AI..."
                     )
-                    
-                    if gemini_key != st.session_state.user_gemini_key:
+                
+                if st.form_submit_button("💾 Save Keys"):
+                    if not env_openai:
+                        st.session_state.user_openai_key = openai_key
+                    if not env_gemini:
                         st.session_state.user_gemini_key = gemini_key
-                    
+            
+            col1, col2 = st.columns(2)
+            
+            with col1:
+                if not env_openai:
+                    if st.session_state.user_openai_key:
+                        st.success("✅ OpenAI key configured (session only)")
+                    else:
+                        st.warning("⚠️ No OpenAI key provided")
+                
+                if st.button("Test OpenAI"):
+                    api_key = env_openai or st.session_state.user_openai_key
+                    if api_key:
+                        ok, message = test_api_key("openai", api_key, probe_openai)
+                        if ok:
+                            st.success("✅ OpenAI connection successful!")
+                        else:
+                            st.error(f"❌ OpenAI test failed: {message}")
+                    else:
+                        st.error("❌ No API key provided")
+            
+            with col2:
+                if not env_gemini:
                     if st.session_state.user_gemini_key:
                         st.success("✅ Gemini key configured (session only)")
                     else:
                         st.warning("⚠️ No Gemini key provided")
-            
-            with col2:
+                
                 if st.button("Test Gemini"):
-                    try:
-                        from google import genai
-                        api_key = env_gemini or st.session_state.user_gemini_key
-                        if api_key:
-                            # Test with a simple API call
-                            client = genai.Client(api_key=api_key)
-                            response = client.models.list()
+                    api_key = env_gemini or st.session_state.user_gemini_key
+                    if api_key:
+                        ok, message = test_api_key("gemini", api_key, probe_gemini)
+                        if ok:
                             st.success("✅ Gemini connection successful!")
                         else:
-                            st.error("❌ No API key provided")
-                    except Exception as e:
-                        st.error(f"❌ Gemini test failed: {str(e)}")
+                            st.error(f"❌ Gemini test failed: {message}")
+                    else:
+                        st.error("❌ No API key provided")
             
             st.markdown("---")
             
@@ -847,6 +754,10 @@ elif page == "Dashboard Builder":
     if st.session_state.data is None:
         st.warning("⚠️ Please upload data first in the Data Upload page.")
     else:
+        # Page components are imported on demand so the setup screen and the
+        # other pages don't pay for loading them
+        from utils.dashboard_builder import DashboardBuilder
+        dashboard_builder = DashboardBuilder()
         dashboard_builder.render_dashboard_builder(st.session_state.data)
 
 # AI Data Chat Page
@@ -856,7 +767,8 @@ elif page == "AI Data Chat":
     if st.session_state.data is None:
         st.warning("⚠️ Please upload data first in the Data Upload page.")
     else:
-        chatbot.render_chat_interface(st.session_state.data)
+        from utils.chatbot import get_chatbot
+        get_chatbot().render_chat_interface(st.session_state.data)
 
 # Reports Page
 elif page == "Reports":
@@ -865,6 +777,8 @@ elif page == "Reports":
     if st.session_state.data is None:
         st.warning("⚠️ Please upload data first in the Data Upload page.")
     else:
+        from utils.report_generator import ReportGenerator
+        report_generator = ReportGenerator()
         report_generator.render_report_interface(
             st.session_state.data,
             st.session_state.dashboard_config
@@ -1,9 +1,252 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
+import ast
 import json
 import os
+import re
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Literal, Optional
+from pydantic import BaseModel
 from google import genai
 from google.genai import types
+from utils.visualization import get_visualization
+
+
+class DataQuery(BaseModel):
+    """Data lookup requested by the assistant"""
+    op: Literal["head", "describe", "info", "missing", "pandas"]
+    expr: Optional[str] = None
+
+
+class ChartConfig(BaseModel):
+    """Chart requested by the assistant"""
+    type: Literal["line", "bar", "scatter", "histogram", "box", "pie"]
+    x_column: Optional[str] = None
+    y_column: Optional[str] = None
+    title: Optional[str] = None
+
+
+class AnalystReply(BaseModel):
+    """Response schema Gemini's JSON replies are constrained to"""
+    text: str
+    action: Literal["show_data", "show_chart", "none"]
+    data_query: Optional[DataQuery] = None
+    chart_config: Optional[ChartConfig] = None
+
+
+# The "text" field of a reply that may still be streaming in; schema order puts it first
+_REPLY_TEXT = re.compile(r'"text"\s*:\s*"((?:[^"\\]|\\.)*)')
+
+
+def _partial_reply_text(raw):
+    """Decode as much of a streaming reply's "text" field as has arrived"""
+    match = _REPLY_TEXT.search(raw)
+    if not match:
+        return ""
+    # Drop an escape sequence cut off at the end of the last chunk
+    body = re.sub(r'\\(u[0-9a-fA-F]{0,3})?$', '', match.group(1))
+    try:
+        return json.loads(f'"{body}"')
+    except ValueError:
+        return ""
+
+
+# Model-written query expressions may only filter and compare columns: comparisons,
+# boolean logic and arithmetic on column names and literals. Method calls are
+# limited to the filtering methods below, so nothing like .to_csv() can run
+_QUERY_NODES = (
+    ast.Expression, ast.Compare, ast.BoolOp, ast.UnaryOp, ast.BinOp,
+    ast.Name, ast.Load, ast.Constant, ast.List, ast.Tuple,
+    ast.Call, ast.Attribute, ast.keyword,
+    ast.And, ast.Or, ast.Not, ast.Invert, ast.USub, ast.UAdd,
+    ast.BitAnd, ast.BitOr, ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow,
+    ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE, ast.In, ast.NotIn
+)
+_QUERY_METHODS = frozenset({'isin', 'between', 'isna', 'notna', 'isnull', 'notnull'})
+_QUERY_STR_METHODS = frozenset({'contains', 'startswith', 'endswith', 'match', 'fullmatch'})
+
+# Backtick-quoted column names aren't Python; they are checked as plain names
+_QUOTED_COLUMN = re.compile(r"`[^`]*`")
+
+
+def _validate_query(expr):
+    """Refuse a query expression that does anything beyond filtering columns"""
+    try:
+        tree = ast.parse(_QUOTED_COLUMN.sub("_column", expr.strip()), mode='eval')
+    except SyntaxError:
+        raise ValueError(f"Invalid query expression: {expr}") from None
+    
+    # Attribute access is only allowed as the method of an allowed call:
+    # column.isin(...) or column.str.contains(...)
+    allowed_attributes = set()
+    for node in ast.walk(tree):
+        if not isinstance(node, ast.Call):
+            continue
+        func = node.func
+        if (isinstance(func, ast.Attribute) and isinstance(func.value, ast.Name)
+                and func.attr in _QUERY_METHODS):
+            allowed_attributes.add(id(func))
+        elif (isinstance(func, ast.Attribute) and func.attr in _QUERY_STR_METHODS
+                and isinstance(func.value, ast.Attribute) and func.value.attr == 'str'
+                and isinstance(func.value.value, ast.Name)):
+            allowed_attributes.update((id(func), id(func.value)))
+        else:
+            raise ValueError(f"Refusing to run query expression: {expr}")
+    
+    for node in ast.walk(tree):
+        if not isinstance(node, _QUERY_NODES) or (
+            isinstance(node, ast.Attribute) and id(node) not in allowed_attributes
+        ):
+            raise ValueError(f"Refusing to run query expression: {expr}")
+
+
+# Context caches are created off the script thread, so the first query on a
+# dataset streams its answer while the cache round-trip is still in flight
+_CONTEXT_CACHE_EXECUTOR = ThreadPoolExecutor(max_workers=2)
+
+
+def _create_context_cache(client, system_prompt):
+    """Create a Gemini context cache holding the dataset prompt, or return None if rejected"""
+    try:
+        cache = client.caches.create(
+            model="gemini-2.5-flash",
+            config=types.CreateCachedContentConfig(
+                contents=[types.Content(role="user", parts=[types.Part(text=system_prompt)])],
+                ttl=f"{_CONTEXT_CACHE_TTL}s"
+            )
+        )
+        return cache.name
+    except Exception:
+        # Prompts below the model's minimum cacheable size are rejected;
+        # the None result is kept so the dataset isn't retried on every query
+        return None
+
+
+def _delete_context_cache(client, future):
+    """Delete the context cache a finished creation future produced, if any"""
+    try:
+        name = future.result()
+        if name:
+            client.caches.delete(name=name)
+    except Exception:
+        # An already expired or never created cache leaves nothing to delete
+        pass
+
+
+@st.cache_resource(show_spinner=False, max_entries=8)
+def get_gemini_client(api_key):
+    """Get the Gemini client for an API key, created once and reused across reruns"""
+    return genai.Client(api_key=api_key)
+
+
+def _pearson_corr(numeric_data):
+    """Pearson correlation matrix, as a single matrix product when nothing is missing"""
+    values = numeric_data.to_numpy(dtype=np.float64, na_value=np.nan)
+    if len(values) < 2 or np.isnan(values).any():
+        # Pairwise-complete correlations need pandas' per-pair NaN handling
+        return numeric_data.corr()
+    
+    values = values - values.mean(axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Constant columns have zero norm and come out as NaN, as in pandas
+        values /= np.sqrt((values * values).sum(axis=0))
+    corr = values.T @ values
+    np.clip(corr, -1.0, 1.0, out=corr)
+    return pd.DataFrame(corr, index=numeric_data.columns, columns=numeric_data.columns)
+
+
+def _truncated_string(series, limit):
+    """Render a per-column Series as text, listing at most limit columns"""
+    # One "name: value" line per column; to_string() would pad every line to
+    # the longest column name and spend prompt tokens on whitespace
+    text = "\n".join(f"{name}: {value}" for name, value in series.iloc[:limit].items())
+    if len(series) > limit:
+        text += f"\n...and {len(series) - limit} more"
+    return text
+
+
+# Below this many cells describe() runs single-threaded; thread start-up costs more
+_PARALLEL_DESCRIBE_MIN_CELLS = 1_000_000
+
+
+def _describe(data):
+    """DataFrame.describe(), with numeric columns summarized in parallel on large frames"""
+    numeric_columns = data.select_dtypes(include=['number']).columns
+    # describe() also covers datetime columns, whose rows differ; keep those on pandas
+    if (len(numeric_columns) < 2
+            or len(data) * len(numeric_columns) < _PARALLEL_DESCRIBE_MIN_CELLS
+            or not data.select_dtypes(include=['datetime', 'datetimetz']).empty):
+        return data.describe()
+    
+    # Sorting for the percentiles dominates and releases the GIL
+    with ThreadPoolExecutor(max_workers=min(len(numeric_columns), os.cpu_count() or 1)) as executor:
+        columns = list(executor.map(lambda column: data[column].describe(), numeric_columns))
+    return pd.concat(columns, axis=1)
+
+
+# Chart types in the reply schema mapped to Visualization chart names
+_CHART_TYPES = {
+    "line": "Line Chart",
+    "bar": "Bar Chart",
+    "scatter": "Scatter Plot",
+    "histogram": "Histogram",
+    "box": "Box Plot",
+    "pie": "Pie Chart"
+}
+
+
+# Columns described in the prompt context, and columns shown in its sample rows
+_CONTEXT_MAX_COLUMNS = 50
+_CONTEXT_SAMPLE_COLUMNS = 30
+
+# Sample values are trimmed to this many characters / significant digits
+_CONTEXT_CELL_CHARS = 60
+_CONTEXT_FLOAT_FORMAT = "%.4g"
+
+# System prompt; only the dataset context changes between datasets
+_SYSTEM_PROMPT = """You are a data analyst assistant. You have access to a dataset with the following information:
+
+{data_context}
+
+Based on user queries, you should:
+1. Analyze the data and provide insights
+2. Suggest appropriate visualizations
+3. Answer questions about the data
+4. Provide data summaries and statistics
+
+Always respond in JSON format with the following structure:
+{{
+    "text": "your analysis and insights",
+    "action": "show_data|show_chart|none",
+    "data_query": {{
+        "op": "head|describe|info|missing|pandas",
+        "expr": "pandas query expression when op is pandas"
+    }},
+    "chart_config": {{
+        "type": "line|bar|scatter|histogram|box|pie",
+        "x_column": "column_name",
+        "y_column": "column_name",
+        "title": "Chart Title"
+    }}
+}}
+"""
+
+# Lifetime of the Gemini context cache holding the dataset prompt (seconds)
+_CONTEXT_CACHE_TTL = 3600
+
+# Number of chat messages rendered per page of history
+_CHAT_WINDOW = 50
+
+# Rows of a query result kept in chat history; the rest is re-run on demand
+_HISTORY_PREVIEW_ROWS = 20
+
+# Fixed size for history tables so old messages don't need layout measuring
+_HISTORY_TABLE_WIDTH = 900
+_HISTORY_TABLE_MAX_HEIGHT = 400
+
 
 class DataChatbot:
     """AI-powered chatbot for data analysis and queries using Gemini"""
@@ -11,6 +254,7 @@ class DataChatbot:
     def __init__(self):
         # Check for API keys from environment or session state
         self.gemini_api_key = os.getenv("GEMINI_API_KEY", "")
+        self._viz = get_visualization()
     
     def _get_gemini_client(self):
         """Get Gemini client with user or environment API key"""
@@ -21,7 +265,7 @@ class DataChatbot:
         api_key = user_gemini_key if user_gemini_key else self.gemini_api_key
         
         if api_key:
-            return genai.Client(api_key=api_key)
+            return get_gemini_client(api_key)
         return None
     
     def render_chat_interface(self, data):
@@ -32,18 +276,39 @@ class DataChatbot:
             st.info("💡 You can also set GEMINI_API_KEY as an environment variable.")
             return
         
+        self._render_chat(data, client)
+    
+    @st.fragment
+    def _render_chat(self, data, client):
+        """Render chat history, input and quick actions; reruns on its own without the rest of the app"""
         # Chat history
         st.subheader("💬 Chat with Your Data")
         
-        # Display chat history
-        for message in st.session_state.chat_history:
+        # Display chat history, only the most recent window unless earlier
+        # messages were requested
+        history = st.session_state.chat_history
+        start_idx = st.session_state.get('_chat_window_start')
+        if start_idx is None:
+            start_idx = max(0, len(history) - _CHAT_WINDOW)
+        if start_idx > 0 and st.button(f"⬆️ Load earlier messages ({start_idx} hidden)"):
+            st.session_state._chat_window_start = max(0, start_idx - _CHAT_WINDOW)
+            st.rerun(scope="fragment")
+        
+        for idx, message in enumerate(history[start_idx:], start=start_idx):
             with st.chat_message(message["role"]):
                 st.write(message["content"])
                 if "data" in message and isinstance(message["data"], pd.DataFrame):
-                    st.dataframe(message["data"], use_container_width=True)
-                elif "data" in message and "chart" in str(message["data"]):
-                    # Handle chart data if present
-                    pass
+                    self._render_result_preview(data, message, idx)
+                if "chart_config" in message:
+                    if st.button("Show chart", key=f"chart_{idx}"):
+                        chart = self._create_chart_from_config(data, message["chart_config"])
+                        if chart:
+                            st.plotly_chart(chart, use_container_width=True)
+        
+        # A quick action queued its query on the previous run; answer it now
+        pending_query = st.session_state.pop('_pending_quick_query', None)
+        if pending_query:
+            self._respond(pending_query, data, client)
         
         # Chat input
         if prompt := st.chat_input("Ask me about your data..."):
@@ -53,30 +318,7 @@ class DataChatbot:
             with st.chat_message("user"):
                 st.write(prompt)
             
-            # Generate AI response
-            with st.chat_message("assistant"):
-                with st.spinner("Analyzing your data..."):
-                    response = self._generate_response(prompt, data, client)
-                    
-                    if response:
-                        st.write(response["text"])
-                        
-                        # Add response to chat history
-                        history_entry = {"role": "assistant", "content": response["text"]}
-                        
-                        if "data" in response:
-                            st.dataframe(response["data"], use_container_width=True)
-                            history_entry["data"] = response["data"]
-                        
-                        if "chart" in response:
-                            st.plotly_chart(response["chart"], use_container_width=True)
-                            history_entry["data"] = {"chart": response["chart"]}
-                        
-                        st.session_state.chat_history.append(history_entry)
-                    else:
-                        error_msg = "I'm sorry, I couldn't process your request. Please try rephrasing your question."
-                        st.write(error_msg)
-                        st.session_state.chat_history.append({"role": "assistant", "content": error_msg})
+            self._respond(prompt, data, client)
         
         # Quick action buttons
         st.markdown("---")
@@ -86,92 +328,154 @@ class DataChatbot:
         
         with col1:
             if st.button("📊 Data Summary"):
-                self._add_quick_query("Give me a summary of this dataset", data, client)
+                self._add_quick_query("Give me a summary of this dataset")
         
         with col2:
             if st.button("🔍 Missing Values"):
-                self._add_quick_query("Show me missing values in the data", data, client)
+                self._add_quick_query("Show me missing values in the data")
         
         with col3:
             if st.button("📈 Correlations"):
-                self._add_quick_query("Show correlations between numeric columns", data, client)
+                self._add_quick_query("Show correlations between numeric columns")
         
         with col4:
             if st.button("🗑️ Clear Chat"):
                 st.session_state.chat_history = []
-                st.rerun()
+                st.session_state._chat_window_start = None
+                st.rerun(scope="fragment")
+    
+    def _respond(self, prompt, data, client):
+        """Generate the AI response to a prompt, render it and add it to the chat history"""
+        with st.chat_message("assistant"):
+            # Holds a status line until the first tokens arrive, then the reply
+            # text as it streams in; the streamed text itself is the progress cue
+            placeholder = st.empty()
+            placeholder.caption("Analyzing your data...")
+            response = self._generate_response(prompt, data, client, placeholder)
+            placeholder.empty()
+            
+            if response:
+                st.write(response["text"])
+                
+                # Add response to chat history
+                history_entry = self._history_entry(response)
+                st.session_state.chat_history.append(history_entry)
+                
+                if "data" in response:
+                    # Same preview the history shows, rather than serializing
+                    # a possibly huge result to the browser
+                    self._render_result_preview(
+                        data, history_entry, len(st.session_state.chat_history) - 1
+                    )
+                
+                if "chart" in response:
+                    st.plotly_chart(response["chart"], use_container_width=True)
+            else:
+                error_msg = "I'm sorry, I couldn't process your request. Please try rephrasing your question."
+                st.write(error_msg)
+                st.session_state.chat_history.append({"role": "assistant", "content": error_msg})
+    
+    def _render_result_preview(self, data, message, idx):
+        """Render the preview of a query result kept in a chat history entry"""
+        preview = message["data"].head(_HISTORY_PREVIEW_ROWS)
+        st.dataframe(
+            preview,
+            width=_HISTORY_TABLE_WIDTH,
+            height=min(35 * len(preview) + 38, _HISTORY_TABLE_MAX_HEIGHT)
+        )
+        total_rows = message.get("data_shape", preview.shape)[0]
+        if total_rows > len(preview):
+            st.caption(f"Showing {len(preview)} of {total_rows} rows")
+            if st.button("Show full result", key=f"full_result_{idx}"):
+                if "data_query" in message:
+                    try:
+                        full_result = self._execute_data_query(data, message["data_query"])
+                    except Exception as e:
+                        st.error(f"Could not execute data query: {str(e)}")
+                        return
+                else:
+                    full_result = preview
+                st.dataframe(full_result, use_container_width=True)
     
-    def _add_quick_query(self, query, data, client):
-        """Add a quick query to the chat"""
+    def _add_quick_query(self, query):
+        """Add a quick query to the chat; it is answered on the following rerun"""
         st.session_state.chat_history.append({"role": "user", "content": query})
-        response = self._generate_response(query, data, client)
+        st.session_state._pending_quick_query = query
+        st.rerun(scope="fragment")
+    
+    def _history_entry(self, response):
+        """Build a chat history entry, keeping only a preview of any query result"""
+        history_entry = {"role": "assistant", "content": response["text"]}
         
-        if response:
-            st.write(response["text"])
-            
-            history_entry = {"role": "assistant", "content": response["text"]}
-            
-            if "data" in response:
-                st.dataframe(response["data"], use_container_width=True)
-                history_entry["data"] = response["data"]
-            
-            if "chart" in response:
-                st.plotly_chart(response["chart"], use_container_width=True)
-                history_entry["data"] = {"chart": response["chart"]}
-            st.session_state.chat_history.append(history_entry)
+        if "data" in response:
+            # The full result can be rebuilt from its query, so history holds
+            # just the first rows and the shape
+            result = response["data"]
+            history_entry["data"] = result.head(_HISTORY_PREVIEW_ROWS)
+            history_entry["data_shape"] = result.shape
+            history_entry["data_query"] = response["data_query"]
+        
+        if "chart" in response:
+            # A figure embeds every plotted point, so history keeps the small
+            # config it was built from and redraws it on request
+            history_entry["chart_config"] = response["chart_config"]
         
-        st.rerun()
+        return history_entry
     
-    def _generate_response(self, query, data, client):
+    def _generate_response(self, query, data, client, placeholder=None):
         """Generate AI response based on user query and data using Gemini"""
         try:
-            # Get data context
-            data_context = self._get_data_context(data)
-            
-            # Create system prompt
-            system_prompt = f"""You are a data analyst assistant. You have access to a dataset with the following information:
-            
-            {data_context}
-            
-            Based on user queries, you should:
-            1. Analyze the data and provide insights
-            2. Suggest appropriate visualizations
-            3. Answer questions about the data
-            4. Provide data summaries and statistics
-            
-            Always respond in JSON format with the following structure:
-            {{
-                "text": "your analysis and insights",
-                "action": "show_data|show_chart|none",
-                "data_query": "pandas query if showing data",
-                "chart_config": {{
-                    "type": "line|bar|scatter|histogram|box|pie",
-                    "x_column": "column_name",
-                    "y_column": "column_name",
-                    "title": "Chart Title"
-                }}
-            }}
-            """
+            # Get the system prompt describing the dataset
+            system_prompt = self._get_system_prompt(data)
             
             # Use Gemini API
             if not client:
                 return None
+            
+            # Send the dataset prompt once per dataset through a context cache
+            # when possible, otherwise inline it with every query
+            cache_name = self._get_context_cache(client, data, system_prompt)
+            if cache_name:
+                prompt_text = f"User query: {query}"
+            else:
+                prompt_text = f"{system_prompt}\n\nUser query: {query}"
                 
-            response = client.models.generate_content(
+            stream = client.models.generate_content_stream(
                 model="gemini-2.5-flash",
                 contents=[
-                    types.Content(role="user", parts=[types.Part(text=f"{system_prompt}\n\nUser query: {query}")])
+                    types.Content(role="user", parts=[types.Part(text=prompt_text)])
                 ],
                 config=types.GenerateContentConfig(
-                    response_mime_type="application/json"
+                    cached_content=cache_name,
+                    response_mime_type="application/json",
+                    response_schema=AnalystReply
                 )
             )
             
-            content = response.text
+            # Collect the JSON reply as it streams, showing its text so far at
+            # most every 50ms; chunks that only extend the fields after "text"
+            # leave the displayed text unchanged and send nothing to the browser
+            chunks = []
+            last_update = 0.0
+            shown_text = ""
+            for chunk in stream:
+                if not chunk.text:
+                    continue
+                chunks.append(chunk.text)
+                if placeholder is not None and time.monotonic() - last_update > 0.05:
+                    partial_text = _partial_reply_text("".join(chunks))
+                    if partial_text != shown_text:
+                        placeholder.markdown(partial_text)
+                        shown_text = partial_text
+                    last_update = time.monotonic()
+            
+            content = "".join(chunks)
             if not content:
                 return None
                 
-            result = json.loads(content)
+            # Streamed replies carry no .parsed, so validate the collected text
+            # against the same schema the model was constrained to
+            result = AnalystReply.model_validate_json(content).model_dump()
             
             # Process the response
             response_data = {"text": result.get("text", "")}
@@ -184,6 +488,7 @@ class DataChatbot:
                         filtered_data = self._execute_data_query(data, data_query)
                         if filtered_data is not None:
                             response_data["data"] = filtered_data
+                            response_data["data_query"] = data_query
                     except Exception as e:
                         response_data["text"] += f"\n\nNote: Could not execute data query: {str(e)}"
             
@@ -195,6 +500,7 @@ class DataChatbot:
                         chart = self._create_chart_from_config(data, chart_config)
                         if chart:
                             response_data["chart"] = chart
+                            response_data["chart_config"] = chart_config
                     except Exception as e:
                         response_data["text"] += f"\n\nNote: Could not create chart: {str(e)}"
             
@@ -204,65 +510,139 @@ class DataChatbot:
             st.error(f"Error generating response: {str(e)}")
             return None
     
-    def _get_data_context(self, data):
-        """Get context information about the dataset"""
+    def _get_stat(self, data, name):
+        """Get a dataset statistic, computed at most once per DataFrame"""
+        # The frame is weakly held so a replaced dataset isn't kept alive here
+        cached = st.session_state.get('_data_stats')
+        if cached is None or cached[0]() is not data:
+            cached = (weakref.ref(data), {})
+            st.session_state['_data_stats'] = cached
+        
+        stats = cached[1]
+        if name not in stats:
+            if name == 'nulls':
+                stats[name] = data.isnull().sum()
+            elif name == 'describe':
+                stats[name] = _describe(data)
+            elif name == 'numeric_columns':
+                stats[name] = data.select_dtypes(include=['number']).columns
+            elif name == 'corr':
+                stats[name] = _pearson_corr(data[self._get_stat(data, 'numeric_columns')])
+            else:
+                raise KeyError(name)
+        return stats[name]
+    
+    def _get_system_prompt(self, data):
+        """Get the system prompt with context information about the dataset"""
+        # The prompt only changes with the dataset, so build it once per DataFrame
+        cached = st.session_state.get('_system_prompt')
+        if cached is not None and cached[0]() is data:
+            return cached[1]
+        
+        # Wide datasets are capped so the prompt size doesn't grow with every column
+        missing = self._get_stat(data, 'nulls')
+        missing = missing[missing > 0]
+        sample = data.iloc[:5, :_CONTEXT_SAMPLE_COLUMNS].map(
+            lambda value: value[:_CONTEXT_CELL_CHARS] if isinstance(value, str) else value
+        )
         context = f"""
         Dataset Shape: {data.shape[0]} rows, {data.shape[1]} columns
         
         Columns:
-        {data.dtypes.to_string()}
+        {_truncated_string(data.dtypes, _CONTEXT_MAX_COLUMNS)}
         
         Sample Data:
-        {data.head().to_string()}
+        {sample.to_csv(index=False, float_format=_CONTEXT_FLOAT_FORMAT)}
         
         Missing Values:
-        {data.isnull().sum().to_string()}
+        {_truncated_string(missing, _CONTEXT_MAX_COLUMNS) if not missing.empty else 'None'}
         """
-        return context
+        system_prompt = _SYSTEM_PROMPT.format(data_context=context)
+        st.session_state['_system_prompt'] = (weakref.ref(data), system_prompt)
+        return system_prompt
+    
+    def _get_context_cache(self, client, data, system_prompt):
+        """Get a Gemini context cache holding the dataset prompt, or None if unavailable"""
+        cached = st.session_state.get('_context_cache')
+        if (cached is not None and cached[0]() is data and cached[1] is client
+                and time.time() < cached[3]):
+            # Queries sent while the cache is still being created carry the prompt inline
+            future = cached[2]
+            return future.result() if future.done() else None
+        
+        # Each cache is billed for storage until its TTL runs out, so the one being
+        # replaced is deleted once its creation has finished
+        if cached is not None:
+            previous_client = cached[1]
+            cached[2].add_done_callback(
+                lambda done: _CONTEXT_CACHE_EXECUTOR.submit(_delete_context_cache, previous_client, done)
+            )
+        
+        # Start creating the cache in the background and answer this query inline
+        # instead of waiting for it; renew a minute early so a query never
+        # references an expired cache
+        future = _CONTEXT_CACHE_EXECUTOR.submit(_create_context_cache, client, system_prompt)
+        st.session_state['_context_cache'] = (weakref.ref(data), client, future, time.time() + _CONTEXT_CACHE_TTL - 60)
+        return None
     
     def _execute_data_query(self, data, query):
-        """Execute a pandas query on the data"""
-        try:
-            # Simple query execution for common operations
-            if "head" in query.lower():
-                return data.head(10)
-            elif "describe" in query.lower():
-                return data.describe()
-            elif "info" in query.lower():
-                return pd.DataFrame({
-                    'Column': data.columns,
-                    'Type': data.dtypes,
-                    'Non-Null Count': data.notna().sum(),
-                    'Null Count': data.isnull().sum()
-                })
-            elif "missing" in query.lower() or "null" in query.lower():
-                missing_data = data.isnull().sum()
-                return missing_data[missing_data > 0].to_frame('Missing Values')
-            else:
-                # Try to execute as pandas query
-                return data.query(query) if query else data.head()
-        except Exception:
+        """Execute a structured data query ({"op": ..., "expr": ...}) on the data"""
+        if isinstance(query, str):
+            # A bare string is treated as a pandas query expression
+            query = {"op": "pandas", "expr": query}
+        op = query.get("op", "pandas")
+        expr = query.get("expr", "")
+        
+        operations = {
+            "head": lambda: data.head(10),
+            "describe": lambda: self._get_stat(data, 'describe'),
+            "info": lambda: self._info_frame(data),
+            "missing": lambda: self._missing_frame(data),
+            "pandas": lambda: self._query_frame(data, expr)
+        }
+        return operations.get(op, operations["pandas"])()
+    
+    def _query_frame(self, data, expr):
+        """Filter the data with a model-written pandas query expression"""
+        if not expr:
             return data.head()
+        _validate_query(expr)
+        # pandas evaluates query() with numexpr when it is installed
+        return data.query(expr)
+    
+    def _info_frame(self, data):
+        """Get per-column type and null counts, like DataFrame.info()"""
+        null_counts = self._get_stat(data, 'nulls')
+        return pd.DataFrame({
+            'Column': data.columns,
+            'Type': data.dtypes,
+            'Non-Null Count': len(data) - null_counts,
+            'Null Count': null_counts
+        })
+    
+    def _missing_frame(self, data):
+        """Get the missing value counts of columns that have any"""
+        missing_data = self._get_stat(data, 'nulls')
+        return missing_data[missing_data > 0].to_frame('Missing Values')
     
     def _create_chart_from_config(self, data, chart_config):
         """Create chart based on AI-generated configuration"""
         try:
-            from utils.visualization import Visualization
-            viz = Visualization()
-            
-            chart_type = chart_config.get("type", "bar")
+            chart_type = _CHART_TYPES.get(chart_config.get("type"), "Bar Chart")
             x_col = chart_config.get("x_column")
             y_col = chart_config.get("y_column")
-            title = chart_config.get("title", "Data Visualization")
+            title = chart_config.get("title") or "Data Visualization"
             
             # Prepare config for visualization
             config = {
                 "x_column": x_col,
                 "y_column": y_col,
+                "names_column": x_col,
+                "values_column": y_col,
                 "title": title
             }
             
-            return viz.create_chart(chart_type, data, config)
+            return self._viz.create_chart(chart_type, data, config)
         except Exception:
             return None
     
@@ -272,25 +652,41 @@ class DataChatbot:
             "shape": data.shape,
             "columns": list(data.columns),
             "dtypes": data.dtypes.to_dict(),
-            "missing_values": data.isnull().sum().to_dict(),
-            "numeric_summary": data.describe().to_dict() if not data.select_dtypes(include=['number']).empty else {}
+            "missing_values": self._get_stat(data, 'nulls').to_dict(),
+            "numeric_summary": self._get_stat(data, 'describe').to_dict() if len(self._get_stat(data, 'numeric_columns')) > 0 else {}
         }
         return summary
     
     def _get_missing_values(self, data):
         """Get missing values information"""
-        missing = data.isnull().sum()
+        missing = self._get_stat(data, 'nulls')
         missing_info = missing[missing > 0].to_dict()
         return missing_info
     
     def _get_correlations(self, data):
         """Get correlation analysis"""
         try:
-            numeric_data = data.select_dtypes(include=['number'])
-            if numeric_data.empty:
+            if len(self._get_stat(data, 'numeric_columns')) == 0:
                 return "No numeric columns found for correlation analysis."
             
-            correlations = numeric_data.corr()
-            return correlations.to_dict()
+            # Strongest pairs from the upper triangle, gathered in one step
+            corr_matrix = self._get_stat(data, 'corr')
+            values = corr_matrix.to_numpy()
+            i, j = np.triu_indices(len(corr_matrix.columns), k=1)
+            pair_values = values[i, j]
+            # Rank on the raw array and build the table from the top ten only
+            top = np.argsort(-np.abs(pair_values), kind='stable')[:10]
+            columns = corr_matrix.columns.to_numpy()
+            return pd.DataFrame({
+                'Column 1': columns[i[top]],
+                'Column 2': columns[j[top]],
+                'Correlation': pair_values[top].round(3)
+            })
         except Exception as e:
             return f"Error calculating correlations: {str(e)}"
+
+
+@st.cache_resource(show_spinner=False)
+def get_chatbot():
+    """Get the shared DataChatbot; it holds no per-session state"""
+    return DataChatbot()
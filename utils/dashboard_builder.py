@@ -1,12 +1,32 @@
 import streamlit as st
 import pandas as pd
-from utils.visualization import Visualization
+from utils.visualization import get_visualization
+from utils.data_processor import METRIC_AGGREGATIONS, get_metric_value, get_top_rows
+
+# Row counts for the chart "Limit Data" options
+_CHART_LIMITS = {"Top 5": 5, "Top 10": 10, "Top 20": 20, "Top 50": 50}
+
+# Row counts for the table "Show" options other than "Custom"
+_TABLE_LIMITS = {"Top 5": 5, "Top 10": 10, "Top 20": 20}
+
+# Selectbox options paired with option -> position lookups for their index
+_COMPONENT_TYPES = ["chart", "metric", "table"]
+_CHART_LIMIT_OPTIONS = ["All data", *_CHART_LIMITS]
+_TABLE_LIMIT_OPTIONS = ["All rows", *_TABLE_LIMITS, "Custom"]
+_SORT_ORDERS = ["Ascending", "Descending"]
+_COMPONENT_TYPE_INDEX = {option: i for i, option in enumerate(_COMPONENT_TYPES)}
+_CHART_LIMIT_INDEX = {option: i for i, option in enumerate(_CHART_LIMIT_OPTIONS)}
+_TABLE_LIMIT_INDEX = {option: i for i, option in enumerate(_TABLE_LIMIT_OPTIONS)}
+_SORT_ORDER_INDEX = {option: i for i, option in enumerate(_SORT_ORDERS)}
+
 
 class DashboardBuilder:
     """Handles dashboard creation and management"""
     
     def __init__(self):
-        self.viz = Visualization()
+        self.viz = get_visualization()
+        self._chart_types = self.viz.get_available_charts()
+        self._chart_type_index = {name: i for i, name in enumerate(self._chart_types)}
     
     def render_dashboard_builder(self, data):
         """Render the dashboard builder interface"""
@@ -62,11 +82,20 @@ class DashboardBuilder:
     def _render_dashboard_components(self, data):
         """Render all dashboard components"""
         for i, component in enumerate(st.session_state.dashboard_config):
-            with st.expander(f"📊 {component['title']}", expanded=True):
-                self._render_single_component(data, component, i)
+            # A collapsed component's controls and chart are not built at all;
+            # expanding it reruns the app to render them
+            with st.expander(
+                f"📊 {component['title']}",
+                expanded=True,
+                key=f"component_expander_{i}",
+                on_change="rerun"
+            ) as expander:
+                if expander.open:
+                    self._render_single_component(data, component, i)
     
+    @st.fragment
     def _render_single_component(self, data, component, index):
-        """Render a single dashboard component"""
+        """Render a single dashboard component; reruns on its own when its widgets change"""
         col1, col2 = st.columns([3, 1])
         
         with col2:
@@ -78,8 +107,8 @@ class DashboardBuilder:
             # Component type selection
             component_type = st.selectbox(
                 "Type",
-                ["chart", "metric", "table"],
-                index=["chart", "metric", "table"].index(component.get('type', 'chart')),
+                _COMPONENT_TYPES,
+                index=_COMPONENT_TYPE_INDEX[component.get('type', 'chart')],
                 key=f"type_{index}"
             )
             component['type'] = component_type
@@ -104,8 +133,8 @@ class DashboardBuilder:
         # Chart type selection
         chart_type = st.selectbox(
             "Chart Type",
-            self.viz.get_available_charts(),
-            index=self.viz.get_available_charts().index(component.get('chart_type', 'Bar Chart')),
+            self._chart_types,
+            index=self._chart_type_index[component.get('chart_type', 'Bar Chart')],
             key=f"chart_type_{index}"
         )
         component['chart_type'] = chart_type
@@ -211,14 +240,14 @@ class DashboardBuilder:
         with col1:
             config['limit_data'] = st.selectbox(
                 "Limit Data",
-                ["All data", "Top 5", "Top 10", "Top 20", "Top 50"],
-                index=["All data", "Top 5", "Top 10", "Top 20", "Top 50"].index(config.get('limit_data', 'All data')),
+                _CHART_LIMIT_OPTIONS,
+                index=_CHART_LIMIT_INDEX[config.get('limit_data', 'All data')],
                 key=f"chart_limit_{index}"
             )
         
         with col2:
             if config.get('limit_data', 'All data') != 'All data':
-                sortable_cols = data.select_dtypes(include=['number']).columns.tolist()
+                sortable_cols = self.viz.get_column_groups(data)['numeric']
                 if sortable_cols:
                     config['sort_by'] = st.selectbox(
                         "Sort by",
@@ -235,25 +264,18 @@ class DashboardBuilder:
         
         # Display the chart
         try:
-            # Apply data filtering if specified
-            chart_data = data.copy()
+            # Apply data filtering if specified; charts only read the data, so
+            # no copy is needed
+            chart_data = data
             limit_data = config.get('limit_data', 'All data')
             
             if limit_data != 'All data':
                 sort_by = config.get('sort_by')
                 if sort_by and sort_by in chart_data.columns:
+                    # Select the top rows with a partial sort instead of
+                    # sorting the whole frame
                     ascending = config.get('sort_order', 'Descending') == 'Ascending'
-                    chart_data = chart_data.sort_values(by=sort_by, ascending=ascending)
-                    
-                    # Apply limit
-                    if limit_data == "Top 5":
-                        chart_data = chart_data.head(5)
-                    elif limit_data == "Top 10":
-                        chart_data = chart_data.head(10)
-                    elif limit_data == "Top 20":
-                        chart_data = chart_data.head(20)
-                    elif limit_data == "Top 50":
-                        chart_data = chart_data.head(50)
+                    chart_data = get_top_rows(data, sort_by, ascending, _CHART_LIMITS[limit_data])
             
             if chart_type == 'Heatmap':
                 if suitable_cols.get('suitable', False):
@@ -279,7 +301,7 @@ class DashboardBuilder:
         config = component.get('config', {})
         
         # Metric configuration
-        numeric_cols = data.select_dtypes(include=['number']).columns.tolist()
+        numeric_cols = self.viz.get_column_groups(data)['numeric']
         
         if not numeric_cols:
             st.warning("⚠️ No numeric columns available for metrics")
@@ -296,7 +318,7 @@ class DashboardBuilder:
             
             config['aggregation'] = st.selectbox(
                 "Aggregation",
-                ["sum", "mean", "count", "min", "max", "median"],
+                list(METRIC_AGGREGATIONS),
                 key=f"metric_agg_{index}"
             )
         
@@ -317,20 +339,7 @@ class DashboardBuilder:
             
             if column and column in data.columns:
                 # Calculate metric value
-                if aggregation == 'sum':
-                    value = data[column].sum()
-                elif aggregation == 'mean':
-                    value = data[column].mean()
-                elif aggregation == 'count':
-                    value = data[column].count()
-                elif aggregation == 'min':
-                    value = data[column].min()
-                elif aggregation == 'max':
-                    value = data[column].max()
-                elif aggregation == 'median':
-                    value = data[column].median()
-                else:
-                    value = 0
+                value = get_metric_value(data, column, aggregation)
                 
                 # Format value
                 if format_type == 'currency':
@@ -352,6 +361,7 @@ class DashboardBuilder:
     def _render_table_component(self, data, component, index):
         """Render table component configuration and display"""
         config = component.get('config', {})
+        all_columns = data.columns.tolist()
         
         # Table configuration
         col1, col2 = st.columns(2)
@@ -359,16 +369,16 @@ class DashboardBuilder:
         with col1:
             config['columns'] = st.multiselect(
                 "Select Columns",
-                data.columns.tolist(),
-                default=config.get('columns', data.columns.tolist()[:5]),
+                all_columns,
+                default=config.get('columns', all_columns[:5]),
                 key=f"table_cols_{index}"
             )
             
             # Limit options
             config['limit_type'] = st.selectbox(
                 "Show",
-                ["All rows", "Top 5", "Top 10", "Top 20", "Custom"],
-                index=["All rows", "Top 5", "Top 10", "Top 20", "Custom"].index(config.get('limit_type', 'All rows')),
+                _TABLE_LIMIT_OPTIONS,
+                index=_TABLE_LIMIT_INDEX[config.get('limit_type', 'All rows')],
                 key=f"table_limit_type_{index}"
             )
             
@@ -383,16 +393,16 @@ class DashboardBuilder:
             # Sorting options
             config['sort_column'] = st.selectbox(
                 "Sort by Column (Optional)",
-                [None] + data.columns.tolist(),
-                index=0 if config.get('sort_column') is None else data.columns.tolist().index(config.get('sort_column')) + 1,
+                [None] + all_columns,
+                index=0 if config.get('sort_column') is None else all_columns.index(config.get('sort_column')) + 1,
                 key=f"table_sort_col_{index}"
             )
             
             if config['sort_column']:
                 config['sort_order'] = st.selectbox(
                     "Sort Order",
-                    ["Ascending", "Descending"],
-                    index=["Ascending", "Descending"].index(config.get('sort_order', 'Ascending')),
+                    _SORT_ORDERS,
+                    index=_SORT_ORDER_INDEX[config.get('sort_order', 'Ascending')],
                     key=f"table_sort_order_{index}"
                 )
         
@@ -403,25 +413,32 @@ class DashboardBuilder:
             selected_cols = config.get('columns', [])
             
             if selected_cols:
-                display_data = data[selected_cols].copy()
+                # Column selection already returns a new frame, and sorting and
+                # row limits below never modify it in place
+                display_data = data[selected_cols]
                 
-                # Apply sorting if specified
+                # Row limit, if any
+                limit_type = config.get('limit_type', 'All rows')
+                if limit_type == "Custom":
+                    limit = config.get('max_rows', 100)
+                else:
+                    limit = _TABLE_LIMITS.get(limit_type)
+                
+                # Apply sorting if specified; a limited numeric sort selects
+                # its rows with a partial sort instead of sorting everything
                 sort_column = config.get('sort_column')
                 if sort_column and sort_column in display_data.columns:
                     ascending = config.get('sort_order', 'Ascending') == 'Ascending'
-                    display_data = display_data.sort_values(by=sort_column, ascending=ascending)
+                    sort_values = display_data[sort_column]
+                    if (limit is not None and pd.api.types.is_numeric_dtype(sort_values)
+                            and not pd.api.types.is_bool_dtype(sort_values)):
+                        display_data = get_top_rows(data, sort_column, ascending, limit)[selected_cols]
+                    else:
+                        display_data = display_data.sort_values(by=sort_column, ascending=ascending)
                 
                 # Apply row limit
-                limit_type = config.get('limit_type', 'All rows')
-                if limit_type == "Top 5":
-                    display_data = display_data.head(5)
-                elif limit_type == "Top 10":
-                    display_data = display_data.head(10)
-                elif limit_type == "Top 20":
-                    display_data = display_data.head(20)
-                elif limit_type == "Custom":
-                    max_rows = config.get('max_rows', 100)
-                    display_data = display_data.head(max_rows)
+                if limit is not None:
+                    display_data = display_data.head(limit)
                 
                 st.dataframe(display_data, use_container_width=True)
                 
@@ -1,6 +1,369 @@
+import os
+import ast
+import pickle
+import warnings
+import weakref
+import numpy as np
 import pandas as pd
 import streamlit as st
 from io import BytesIO
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+try:
+    import pyarrow as pa
+    from pyarrow import csv as pa_csv
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+try:
+    import python_calamine
+    CALAMINE_AVAILABLE = True
+except ImportError:
+    CALAMINE_AVAILABLE = False
+try:
+    import numexpr
+    NUMEXPR_AVAILABLE = True
+except ImportError:
+    NUMEXPR_AVAILABLE = False
+
+# The Rust calamine reader is much faster than openpyxl and also reads .xls
+_EXCEL_ENGINE = 'calamine' if CALAMINE_AVAILABLE else None
+
+
+def _read_csv_pyarrow(file_bytes):
+    """Read CSV bytes with pyarrow, parsed the way pd.read_csv would, or None"""
+    # Binary columns mean the file is not valid UTF-8; the latin-1
+    # fallback stays on the pyarrow parser rather than pandas'
+    for encoding in ('utf8', 'latin-1'):
+        read_options = pa_csv.ReadOptions(use_threads=True, block_size=8 << 20, encoding=encoding)
+        # Blank cells in text columns are missing values, as in pandas
+        convert_options = pa_csv.ConvertOptions(strings_can_be_null=True)
+        table = pa_csv.read_csv(
+            pa.BufferReader(file_bytes), read_options=read_options, convert_options=convert_options
+        )
+        if any(pa.types.is_binary(field.type) for field in table.schema):
+            continue
+        
+        # pandas renames blank and duplicate headers ("Unnamed: 0", "a.1");
+        # leave those files to it
+        names = table.column_names
+        if '' in names or len(set(names)) != len(names):
+            return None
+        
+        # pandas keeps dates and times as text; re-read any column pyarrow
+        # inferred as temporal as a string column
+        temporal = [field.name for field in table.schema if pa.types.is_temporal(field.type)]
+        if temporal:
+            convert_options.column_types = {name: pa.string() for name in temporal}
+            table = pa_csv.read_csv(
+                pa.BufferReader(file_bytes), read_options=read_options, convert_options=convert_options
+            )
+        return table.to_pandas(self_destruct=True)
+    return None
+
+
+def _read_csv(file_bytes):
+    """Read CSV bytes, preferring the multi-threaded pyarrow parser"""
+    if PYARROW_AVAILABLE:
+        try:
+            df = _read_csv_pyarrow(file_bytes)
+            if df is not None:
+                return df
+        except pa.ArrowInvalid:
+            pass
+    
+    # Try different encodings for CSV files
+    try:
+        return pd.read_csv(BytesIO(file_bytes), encoding='utf-8')
+    except UnicodeDecodeError:
+        return pd.read_csv(BytesIO(file_bytes), encoding='latin-1')
+
+
+_NAN_STATS = {'mean': np.nanmean, 'median': np.nanmedian}
+
+# Below this many cells the thread pool costs more than it saves
+_PARALLEL_FILL_MIN_CELLS = 1_000_000
+
+
+def _fill_numeric(series, how):
+    """Fill missing values in a numeric column with its mean or median"""
+    if not (isinstance(series.dtype, np.dtype) and series.dtype.kind == 'f'):
+        # Integer and nullable extension dtypes take the pandas path
+        return series.fillna(getattr(series, how)())
+    
+    # Work on the raw float buffer: one NaN scan, one masked copy
+    values = series.to_numpy(copy=True)
+    mask = np.isnan(values)
+    if not mask.any() or mask.all():
+        return series
+    np.copyto(values, _NAN_STATS[how](values), where=mask)
+    return pd.Series(values, index=series.index, name=series.name)
+
+
+# Held as a shared resource so reruns get the same frame back instead of
+# unpickling a fresh copy; load_file hands each session its own shallow
+# copy of it, so edits in one session can't reach another
+@st.cache_resource(show_spinner=False, max_entries=4)
+def _load_cached(file_bytes, name, sheet_name=0):
+    """Parse and clean an uploaded file, cached on its contents"""
+    file_extension = name.split('.')[-1].lower()
+    
+    if file_extension == 'csv':
+        df = _read_csv(file_bytes)
+    
+    elif file_extension in ['xlsx', 'xls']:
+        try:
+            df = pd.read_excel(BytesIO(file_bytes), sheet_name=sheet_name, engine=_EXCEL_ENGINE)
+        except Exception:
+            # Fallback: try without specifying sheet_name
+            df = pd.read_excel(BytesIO(file_bytes), engine=_EXCEL_ENGINE)
+    
+    else:
+        raise ValueError(f"Unsupported file format: {file_extension}")
+    
+    # Basic data cleaning
+    return DataProcessor._clean_data(df)
+
+
+def _fill_float_block(df, columns, how):
+    """Fill several same-dtype float columns with their mean or median in one 2D pass"""
+    block = df[columns].to_numpy()
+    with warnings.catch_warnings():
+        # All-NaN columns have no statistic and simply stay NaN
+        warnings.simplefilter('ignore', RuntimeWarning)
+        stats = _NAN_STATS[how](block, axis=0)
+    return np.where(np.isnan(block), stats, block)
+
+
+# Functions a formula may call, matching the ones pd.eval accepts
+_FORMULA_FUNCTIONS = {
+    name: getattr(np, name) for name in (
+        'abs', 'sqrt', 'exp', 'expm1', 'log', 'log1p', 'log10',
+        'sin', 'cos', 'tan', 'arcsin', 'arccos', 'arctan', 'arctan2',
+        'sinh', 'cosh', 'tanh', 'arcsinh', 'arccosh', 'arctanh'
+    )
+}
+
+# Arithmetic, comparison and element-wise logic only: no attribute access,
+# subscripts, lambdas or comprehensions
+_FORMULA_NODES = (
+    ast.Expression, ast.BinOp, ast.UnaryOp, ast.Compare, ast.Call,
+    ast.Name, ast.Load, ast.Constant,
+    ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow,
+    ast.BitAnd, ast.BitOr, ast.BitXor, ast.Invert, ast.USub, ast.UAdd,
+    ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE
+)
+
+
+@lru_cache(maxsize=256)
+def _compile_formula(formula):
+    """Validate a calculated-column formula and compile it once per formula text"""
+    tree = ast.parse(formula.strip(), mode='eval')
+    for node in ast.walk(tree):
+        if not isinstance(node, _FORMULA_NODES):
+            raise ValueError(f"Unsupported syntax in formula: {type(node).__name__}")
+        if isinstance(node, ast.Call) and (
+            not isinstance(node.func, ast.Name)
+            or node.func.id not in _FORMULA_FUNCTIONS
+            or node.keywords
+        ):
+            raise ValueError("Only basic math functions can be called in a formula")
+    names = frozenset(node.id for node in ast.walk(tree) if isinstance(node, ast.Name))
+    return compile(tree, '<formula>', 'eval'), names
+
+
+def _evaluate_formula(formula, code, columns):
+    """Evaluate a validated formula over the bound columns"""
+    # Float columns only: on integers numexpr keeps C semantics, so x // 0
+    # and x % 0 give 0 where pandas gives inf and NaN, and abs() turns
+    # them into floats
+    if NUMEXPR_AVAILABLE and columns and all(
+        isinstance(series.dtype, np.dtype) and series.dtype.kind == 'f'
+        for series in columns.values()
+    ):
+        # numexpr fuses the whole expression into one blocked pass over the
+        # raw arrays instead of a full-size temporary per operation
+        try:
+            arrays = {ref: series.to_numpy() for ref, series in columns.items()}
+            result = numexpr.evaluate(formula.strip(), local_dict=arrays, global_dict={})
+            return pd.Series(result, index=next(iter(columns.values())).index)
+        except Exception:
+            # Operations numexpr rejects, such as bitwise operators on
+            # floats or functions it doesn't provide, fall back to NumPy
+            pass
+    return eval(code, {'__builtins__': {}, **_FORMULA_FUNCTIONS}, columns)
+
+
+def _df_fingerprint(df):
+    """Hash every row of a DataFrame for st.cache_data keys"""
+    # Streamlit's default DataFrame hash only samples 10,000 rows of large
+    # frames, so filling a few cells could hand back the pre-fill summary or
+    # CSV; per-row hashes in order catch any changed value or row order
+    try:
+        row_hashes = pd.util.hash_pandas_object(df, index=True).to_numpy()
+    except TypeError:
+        # Unhashable cell values such as lists
+        return pickle.dumps(df, pickle.HIGHEST_PROTOCOL)
+    return (df.shape, tuple(map(str, df.columns)), tuple(map(str, df.dtypes)), row_hashes.tobytes())
+
+
+_DF_HASH_FUNCS = {pd.DataFrame: _df_fingerprint}
+
+
+def _per_frame(key, df, compute):
+    """Get compute(df), reused from session state while the same frame object is current"""
+    # Skips even the cache_data fingerprint on reruns that didn't change the
+    # data. The frame is held by weak reference so a replaced frame can be
+    # freed instead of lingering here until the key is next written.
+    cached = st.session_state.get(key)
+    if cached is not None and cached[0]() is df:
+        return cached[1]
+    
+    result = compute(df)
+    st.session_state[key] = (weakref.ref(df), result)
+    return result
+
+
+# Series reductions offered by metric components
+METRIC_AGGREGATIONS = ("sum", "mean", "count", "min", "max", "median")
+
+# NumPy's fmin/fmax reductions over the raw buffer are several times faster
+# than pandas' min/max on plain numeric columns
+_NUMPY_EXTREMES = {"min": np.nanmin, "max": np.nanmax}
+
+
+def get_metric_value(data, column, aggregation):
+    """Get an aggregated column value, computed once per DataFrame"""
+    # Metric components and the report preview would otherwise recompute
+    # these on every rerun; reuse them while the same frame object is current
+    cached = st.session_state.get('_metric_values')
+    if cached is None or cached[0]() is not data:
+        cached = (weakref.ref(data), {})
+        st.session_state['_metric_values'] = cached
+    
+    values = cached[1]
+    key = (column, aggregation)
+    if key not in values:
+        series = data[column]
+        if (aggregation in _NUMPY_EXTREMES and len(series) > 0
+                and isinstance(series.dtype, np.dtype) and series.dtype.kind in 'iuf'):
+            with warnings.catch_warnings():
+                # An all-NaN column has no extreme and yields NaN, as in pandas
+                warnings.simplefilter('ignore', RuntimeWarning)
+                values[key] = _NUMPY_EXTREMES[aggregation](series.to_numpy())
+        elif aggregation in METRIC_AGGREGATIONS:
+            values[key] = getattr(series, aggregation)()
+        else:
+            values[key] = 0
+    return values[key]
+
+
+def get_top_rows(data, column, ascending, limit):
+    """Get the first limit rows of the data ordered by a numeric column, shared by all components"""
+    # Charts and tables with the same sort and limit reuse one selection
+    # while the same frame object is current
+    cached = st.session_state.get('_top_rows')
+    if cached is None or cached[0]() is not data:
+        cached = (weakref.ref(data), {})
+        st.session_state['_top_rows'] = cached
+    
+    selections = cached[1]
+    key = (column, ascending, limit)
+    if key not in selections:
+        if data[column].count() < limit:
+            # nlargest/nsmallest drop missing values; a sort keeps them last,
+            # so a sparse column still fills the requested number of rows
+            selections[key] = data.sort_values(by=column, ascending=ascending).head(limit)
+        elif ascending:
+            selections[key] = data.nsmallest(limit, column)
+        else:
+            selections[key] = data.nlargest(limit, column)
+    return selections[key]
+
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def _excel_sheet_names(file_bytes):
+    """List the sheets of an Excel workbook, cached on its contents"""
+    return pd.ExcelFile(BytesIO(file_bytes), engine=_EXCEL_ENGINE).sheet_names
+
+
+@st.cache_data(show_spinner=False, max_entries=8, hash_funcs=_DF_HASH_FUNCS)
+def _frame_summary(df):
+    """Compute per-column missing counts, dtypes and memory usage once per DataFrame"""
+    missing = df.isnull().sum()
+    return {
+        'missing': missing,
+        'total_missing': int(missing.sum()),
+        # As strings: Arrow cannot serialize dtype objects for display
+        'dtypes': df.dtypes.astype(str),
+        'memory_mb': df.memory_usage(deep=True).sum() / 1024**2
+    }
+
+
+@st.cache_data(show_spinner=False, max_entries=4, hash_funcs=_DF_HASH_FUNCS)
+def _csv_bytes(df):
+    """Serialize a DataFrame to CSV once per DataFrame"""
+    return df.to_csv(index=False).encode('utf-8')
+
+
+@st.cache_data(show_spinner=False, max_entries=8, hash_funcs=_DF_HASH_FUNCS)
+def _missing_summary(df):
+    """Build the per-column missing value summary once per DataFrame"""
+    # Whole-frame null counts and dtypes, zipped per column
+    missing_counts = df.isnull().sum()
+    total_count = len(df)
+    missing_info = {}
+    for col, missing_count, dtype in zip(df.columns, missing_counts.tolist(), df.dtypes):
+        missing_info[col] = {
+            'missing_count': missing_count,
+            'total_count': total_count,
+            'missing_percentage': (missing_count / total_count * 100) if total_count > 0 else 0,
+            'data_type': str(dtype),
+            'has_missing': missing_count > 0
+        }
+    return missing_info
+
+
+@st.cache_data(show_spinner=False, max_entries=8, hash_funcs=_DF_HASH_FUNCS)
+def _column_info(df):
+    """Build the per-column info table once per DataFrame"""
+    # Null and unique counts come from whole-frame reductions; only the
+    # sample values need a per-column pass, and over 3 values at most
+    return pd.DataFrame({
+        'Column': df.columns,
+        'Type': df.dtypes.astype(str).to_numpy(),
+        'Null Count': df.isnull().sum().to_numpy(),
+        'Unique Values': df.nunique().to_numpy(),
+        'Sample Values': [df.iloc[:, i].dropna().head(3).tolist() for i in range(df.shape[1])]
+    })
+
+
+@st.cache_data(show_spinner=False, max_entries=8, hash_funcs=_DF_HASH_FUNCS)
+def _summary_stats(df):
+    """Compute numeric and categorical summary statistics once per DataFrame"""
+    stats = {}
+    
+    # Numeric columns statistics
+    numeric_cols = df.select_dtypes(include=['number']).columns
+    if len(numeric_cols) > 0:
+        stats['numeric'] = df[numeric_cols].describe()
+    
+    # Categorical columns statistics; one value_counts() per column gives the
+    # unique count, the most frequent value and the top frequencies
+    categorical_cols = df.select_dtypes(include=['object']).columns
+    if len(categorical_cols) > 0:
+        cat_stats = {}
+        for col in categorical_cols:
+            counts = df[col].value_counts()
+            cat_stats[col] = {
+                'unique_count': len(counts),
+                'most_frequent': counts.index[0] if len(counts) > 0 else None,
+                'frequency': counts.head()
+            }
+        stats['categorical'] = cat_stats
+    
+    return stats
+
 
 class DataProcessor:
     """Handles data loading, processing, and manipulation operations"""
@@ -8,94 +371,72 @@ class DataProcessor:
     def __init__(self):
         pass
     
-    def load_file(self, uploaded_file):
+    def load_file(self, uploaded_file, sheet_name=0):
         """Load CSV or Excel file and return pandas DataFrame"""
         try:
-            file_extension = uploaded_file.name.split('.')[-1].lower()
-            
-            if file_extension == 'csv':
-                # Try different encodings for CSV files
-                try:
-                    df = pd.read_csv(uploaded_file, encoding='utf-8')
-                except UnicodeDecodeError:
-                    uploaded_file.seek(0)
-                    df = pd.read_csv(uploaded_file, encoding='latin-1')
-            
-            elif file_extension in ['xlsx', 'xls']:
-                # Enhanced Excel reading with multiple sheet support
-                try:
-                    # Try to read the first sheet by default
-                    df = pd.read_excel(uploaded_file, sheet_name=0)
-                    
-                    # If there are multiple sheets, inform the user
-                    uploaded_file.seek(0)
-                    excel_file = pd.ExcelFile(uploaded_file)
-                    if len(excel_file.sheet_names) > 1:
-                        # For now, use the first sheet but could be enhanced to let user choose
-                        df = pd.read_excel(uploaded_file, sheet_name=excel_file.sheet_names[0])
-                        
-                except Exception as e:
-                    # Fallback: try without specifying sheet_name
-                    uploaded_file.seek(0)
-                    df = pd.read_excel(uploaded_file)
-            
-            else:
-                raise ValueError(f"Unsupported file format: {file_extension}")
-            
-            # Basic data cleaning
-            df = self._clean_data(df)
+            # Read the upload once; parsing is cached on the file contents.
+            # UploadedFile wraps Streamlit's own bytes, so getvalue() returns
+            # that buffer without copying (getbuffer() would force a copy).
+            file_bytes = uploaded_file.getvalue()
+            shared = _load_cached(file_bytes, uploaded_file.name, sheet_name)
             
+            # Copy-on-Write keeps the shallow copy cheap; the session gets the
+            # same copy back on reruns so per-frame memos stay valid
+            cached = st.session_state.get('_loaded_frame')
+            if cached is not None and cached[0]() is shared:
+                return cached[1]
+            df = shared.copy(deep=False)
+            st.session_state['_loaded_frame'] = (weakref.ref(shared), df)
             return df
             
         except Exception as e:
             raise Exception(f"Error loading file: {str(e)}")
     
-    def _clean_data(self, df):
+    def get_sheet_names(self, uploaded_file):
+        """Get the sheet names of an uploaded Excel file"""
+        return _excel_sheet_names(uploaded_file.getvalue())
+    
+    def get_frame_summary(self, df):
+        """Get missing values, dtypes and memory usage for the DataFrame"""
+        return _per_frame('_frame_summary', df, _frame_summary)
+    
+    def to_csv_bytes(self, df):
+        """Get the DataFrame as CSV bytes for download"""
+        return _csv_bytes(df)
+    
+    @staticmethod
+    def _clean_data(df):
         """Perform basic data cleaning operations"""
         # Remove completely empty rows and columns
         df = df.dropna(how='all').dropna(axis=1, how='all')
         
+        # Text columns are object dtype before pandas 3 and str from pandas 3 on
+        string_columns = df.select_dtypes(include=['object', 'string']).columns
+        if len(string_columns) == 0:
+            return df
+        
         # Strip whitespace from string columns
-        string_columns = df.select_dtypes(include=['object']).columns
-        for col in string_columns:
-            df[col] = df[col].astype(str).str.strip()
+        stripped = df[string_columns].apply(lambda col: col.astype(str).str.strip())
         
-        # Convert numeric strings to numbers where possible
-        for col in df.columns:
-            if df[col].dtype == 'object':
-                try:
-                    # Attempt to convert to numeric safely
-                    numeric_series = pd.to_numeric(df[col], errors='coerce')
-                    # Only convert if we didn't lose too much data
-                    non_null_count = numeric_series.notna().sum()
-                    if non_null_count > len(df[col]) * 0.5:
-                        df[col] = numeric_series
-                except:
-                    pass
+        # Convert numeric strings to numbers where possible, but only columns
+        # where we don't lose too much data
+        numeric = stripped.apply(pd.to_numeric, errors='coerce')
+        convert = numeric.notna().sum() > len(df) * 0.5
         
+        df[string_columns] = stripped
+        if convert.any():
+            df[convert.index[convert]] = numeric.loc[:, convert]
         return df
     
     def get_column_info(self, df):
         """Get detailed information about DataFrame columns"""
-        info = []
-        for col in df.columns:
-            col_type = str(df[col].dtype)
-            null_count = df[col].isnull().sum()
-            unique_count = df[col].nunique()
-            
-            info.append({
-                'Column': col,
-                'Type': col_type,
-                'Null Count': null_count,
-                'Unique Values': unique_count,
-                'Sample Values': df[col].dropna().head(3).tolist()
-            })
-        
-        return pd.DataFrame(info)
+        return _per_frame('_column_info', df, _column_info)
     
     def filter_data(self, df, filters):
         """Apply filters to DataFrame based on user input"""
-        filtered_df = df.copy()
+        # Combine every filter into one row mask and slice the frame once at
+        # the end, instead of materializing an intermediate frame per filter
+        mask = np.ones(len(df), dtype=bool)
         
         for filter_config in filters:
             column = filter_config['column']
@@ -106,69 +447,84 @@ class DataProcessor:
                 continue
             
             try:
+                series = df[column]
                 if operator == 'equals':
-                    filtered_df = filtered_df[filtered_df[column] == value]
+                    condition = series == value
                 elif operator == 'not_equals':
-                    filtered_df = filtered_df[filtered_df[column] != value]
+                    condition = series != value
                 elif operator == 'contains':
-                    filtered_df = filtered_df[filtered_df[column].astype(str).str.contains(str(value), na=False)]
+                    # Plain substring search; Arrow-backed string columns scan
+                    # their buffers directly without a str conversion first
+                    if not pd.api.types.is_string_dtype(series):
+                        series = series.astype(str)
+                    condition = series.str.contains(str(value), na=False, regex=False)
                 elif operator == 'greater_than':
-                    filtered_df = filtered_df[filtered_df[column] > value]
+                    condition = series > value
                 elif operator == 'less_than':
-                    filtered_df = filtered_df[filtered_df[column] < value]
-                elif operator == 'between':
-                    if isinstance(value, list) and len(value) == 2:
-                        filtered_df = filtered_df[(filtered_df[column] >= value[0]) & (filtered_df[column] <= value[1])]
+                    condition = series < value
+                elif operator == 'between' and isinstance(value, list) and len(value) == 2:
+                    condition = (series >= value[0]) & (series <= value[1])
+                else:
+                    continue
+                mask &= condition.to_numpy(dtype=bool, na_value=False)
             except Exception as e:
                 st.error(f"Error applying filter to column {column}: {str(e)}")
         
-        return filtered_df
+        return df[mask]
     
     def get_summary_stats(self, df):
         """Generate summary statistics for the DataFrame"""
-        stats = {}
-        
-        # Numeric columns statistics
-        numeric_cols = df.select_dtypes(include=['number']).columns
-        if len(numeric_cols) > 0:
-            stats['numeric'] = df[numeric_cols].describe()
-        
-        # Categorical columns statistics
-        categorical_cols = df.select_dtypes(include=['object']).columns
-        if len(categorical_cols) > 0:
-            cat_stats = {}
-            for col in categorical_cols:
-                cat_stats[col] = {
-                    'unique_count': df[col].nunique(),
-                    'most_frequent': df[col].mode().iloc[0] if not df[col].empty else None,
-                    'frequency': df[col].value_counts().head()
-                }
-            stats['categorical'] = cat_stats
-        
-        return stats
+        return _per_frame('_summary_stats', df, _summary_stats)
     
     def handle_missing_values(self, df, fill_config):
         """Handle missing values based on user configuration"""
-        df_cleaned = df.copy()
+        # Copy-on-Write (enabled in app.py) makes a shallow copy enough: only the
+        # columns that get filled are materialized, the rest stay shared with df
+        df_cleaned = df.copy(deep=False)
+        
+        # Fast path: a single mean/median policy over columns sharing one float
+        # dtype is done as one vectorized pass over the 2D block
+        methods = {method['type'] for method in fill_config.values()}
+        columns = list(fill_config)
+        if (len(columns) > 1 and len(methods) == 1 and methods <= {'mean', 'median'}
+                and all(column in df_cleaned.columns for column in columns)):
+            dtypes = set(df_cleaned[columns].dtypes)
+            dtype = dtypes.pop()
+            if not dtypes and isinstance(dtype, np.dtype) and dtype.kind == 'f':
+                df_cleaned[columns] = _fill_float_block(df_cleaned, columns, methods.pop())
+                return df_cleaned
+        
+        # Mean/median fills are independent per column, so compute them on a
+        # thread pool (NumPy releases the GIL) unless a row drop could change
+        # the statistics in between
+        prefilled = {}
+        stat_columns = [
+            column for column, method in fill_config.items()
+            if method['type'] in ('mean', 'median')
+            and column in df_cleaned.columns
+            and pd.api.types.is_numeric_dtype(df_cleaned[column])
+        ]
+        has_drop = any(method['type'] == 'drop' for method in fill_config.values())
+        if (len(stat_columns) > 1 and not has_drop
+                and len(df_cleaned) * len(stat_columns) >= _PARALLEL_FILL_MIN_CELLS):
+            with ThreadPoolExecutor(max_workers=min(len(stat_columns), os.cpu_count() or 1)) as executor:
+                filled = executor.map(
+                    lambda column: _fill_numeric(df_cleaned[column], fill_config[column]['type']),
+                    stat_columns
+                )
+                prefilled = dict(zip(stat_columns, filled))
         
         for column, method in fill_config.items():
             if column not in df_cleaned.columns:
                 continue
             
-            # Track processing for debugging
-            missing_before = df_cleaned[column].isnull().sum()
-                
-            if method['type'] == 'mean':
-                # Handle numeric columns
-                if pd.api.types.is_numeric_dtype(df_cleaned[column]):
-                    mean_val = df_cleaned[column].mean()
-                    df_cleaned[column] = df_cleaned[column].fillna(mean_val)
+            if column in prefilled:
+                df_cleaned[column] = prefilled[column]
             
-            elif method['type'] == 'median':
+            elif method['type'] in ('mean', 'median'):
                 # Handle numeric columns
                 if pd.api.types.is_numeric_dtype(df_cleaned[column]):
-                    median_val = df_cleaned[column].median()
-                    df_cleaned[column] = df_cleaned[column].fillna(median_val)
+                    df_cleaned[column] = _fill_numeric(df_cleaned[column], method['type'])
             
             elif method['type'] == 'mode':
                 mode_values = df_cleaned[column].mode()
@@ -198,16 +554,19 @@ class DataProcessor:
     
     def add_calculated_column(self, df, column_name, formula, column_references):
         """Add a calculated column based on formula and referenced columns"""
-        df_with_calc = df.copy()
+        df_with_calc = df.copy(deep=False)
         
         try:
-            # Replace column references in formula with actual column names
-            working_formula = formula
-            for ref, actual_col in column_references.items():
-                working_formula = working_formula.replace(ref, f"df_with_calc['{actual_col}']")
+            code, names = _compile_formula(formula)
+            unknown = names - column_references.keys() - _FORMULA_FUNCTIONS.keys()
+            if unknown:
+                raise ValueError(f"Unknown column reference: {', '.join(sorted(unknown))}")
             
-            # Evaluate the formula safely
-            df_with_calc[column_name] = eval(working_formula)
+            # Bind only the column references (A1, A2, ...) the formula uses
+            columns = {ref: df_with_calc[column_references[ref]] for ref in names & column_references.keys()}
+            result = _evaluate_formula(formula, code, columns)
+            
+            df_with_calc[column_name] = result
             return df_with_calc, None
             
         except Exception as e:
@@ -215,23 +574,11 @@ class DataProcessor:
     
     def drop_columns(self, df, columns_to_drop):
         """Drop specified columns from DataFrame"""
-        df_modified = df.copy()
-        existing_columns = [col for col in columns_to_drop if col in df_modified.columns]
+        existing_columns = [col for col in columns_to_drop if col in df.columns]
         if existing_columns:
-            df_modified = df_modified.drop(columns=existing_columns)
-        return df_modified
+            return df.drop(columns=existing_columns)
+        return df.copy(deep=False)
     
     def get_missing_value_summary(self, df):
         """Get comprehensive summary of missing values"""
-        missing_info = {}
-        for col in df.columns:
-            missing_count = df[col].isnull().sum()
-            total_count = len(df)
-            missing_info[col] = {
-                'missing_count': missing_count,
-                'total_count': total_count,
-                'missing_percentage': (missing_count / total_count * 100) if total_count > 0 else 0,
-                'data_type': str(df[col].dtype),
-                'has_missing': missing_count > 0
-            }
-        return missing_info
+        return _per_frame('_missing_summary', df, _missing_summary)
@@ -2,19 +2,83 @@ import streamlit as st
 import pandas as pd
 from io import BytesIO
 import json
+import re
 from datetime import datetime
+from functools import partial
+from xml.sax.saxutils import escape
+from utils.data_processor import DataProcessor, get_metric_value
 try:
     from docx import Document
+    from docx.oxml import parse_xml
+    from docx.oxml.ns import nsdecls
     from docx.shared import Inches
     DOCX_AVAILABLE = True
 except ImportError:
     DOCX_AVAILABLE = False
+try:
+    import pyarrow
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+
+def _parquet_bytes(data):
+    """Serialize a DataFrame to zstd-compressed Parquet"""
+    buffer = BytesIO()
+    data.to_parquet(buffer, engine='pyarrow', compression='zstd', index=False)
+    return buffer.getvalue()
+
+
+# Characters XML 1.0 can't contain; a column name or cell holding one would make
+# the deferred DOCX build fail after its download button is already shown
+_XML_INVALID = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\ud800-\udfff\ufffe\uffff]')
+
+
+def _xml_text(value):
+    """Strip the characters XML can't hold from text going into the DOCX report"""
+    return _XML_INVALID.sub('', value)
+
+
+def _append_text_rows(table, rows):
+    """Append rows of string cells to a python-docx table in one XML parse"""
+    # Setting cell.text walks python-docx's object layer for every cell;
+    # parsing all rows as one fragment builds the same XML far faster
+    widths = [column.width.twips for column in table.columns]
+    rows_xml = ''.join(
+        '<w:tr>' + ''.join(
+            f'<w:tc><w:tcPr><w:tcW w:type="dxa" w:w="{width}"/></w:tcPr>'
+            f'<w:p><w:r><w:t xml:space="preserve">{escape(_xml_text(value))}</w:t></w:r></w:p></w:tc>'
+            for width, value in zip(widths, row)
+        ) + '</w:tr>'
+        for row in rows
+    )
+    for tr in parse_xml(f'<w:tbl {nsdecls("w")}>{rows_xml}</w:tbl>'):
+        table._tbl.append(tr)
+
+
+def _summary_json(summary):
+    """Serialize the JSON summary export, in C with orjson when it's installed"""
+    if ORJSON_AVAILABLE:
+        # NumPy scalars and non-string column names are handled natively,
+        # with no Python default() call per value
+        return orjson.dumps(
+            summary,
+            default=str,
+            option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        )
+    return json.dumps(summary, indent=2, default=str)
 
 class ReportGenerator:
     """Handles report generation and export functionality"""
     
     def __init__(self):
-        pass
+        # Shares the per-frame summary caches with the rest of the app
+        self.data_processor = DataProcessor()
     
     def render_report_interface(self, data, dashboard_config):
         """Render the report generation interface"""
@@ -32,7 +96,7 @@ class ReportGenerator:
         # Export options
         st.subheader("📤 Export Options")
         
-        col1, col2, col3 = st.columns(3)
+        col1, col2, col3, col4 = st.columns(4)
         
         with col1:
             if st.button("📊 Export Data (CSV)"):
@@ -48,6 +112,13 @@ class ReportGenerator:
                     self._export_docx_report(data, dashboard_config, report_config)
             else:
                 st.button("📄 Export Report (DOCX)", disabled=True, help="python-docx not available")
+        
+        with col4:
+            if PARQUET_AVAILABLE:
+                if st.button("📦 Export Data (Parquet)"):
+                    self._export_parquet(data)
+            else:
+                st.button("📦 Export Data (Parquet)", disabled=True, help="pyarrow not available")
     
     def _get_report_config(self, data, dashboard_config):
         """Get report configuration from user input"""
@@ -111,34 +182,25 @@ class ReportGenerator:
                 st.metric("Total Columns", data.shape[1])
             
             with col3:
-                missing_count = data.isnull().sum().sum()
+                missing_count = self.data_processor.get_frame_summary(data)['total_missing']
                 st.metric("Missing Values", f"{missing_count:,}")
             
             # Column information
             st.markdown("### Column Information")
-            col_info = []
-            for col in data.columns:
-                col_info.append({
-                    'Column': col,
-                    'Type': str(data[col].dtype),
-                    'Non-Null Count': data[col].count(),
-                    'Unique Values': data[col].nunique()
-                })
-            
-            st.dataframe(pd.DataFrame(col_info), use_container_width=True)
+            st.dataframe(self._column_overview(data), use_container_width=True)
             
             # Basic statistics for numeric columns
-            numeric_cols = data.select_dtypes(include=['number']).columns
-            if len(numeric_cols) > 0:
+            summary_stats = self.data_processor.get_summary_stats(data)
+            if 'numeric' in summary_stats:
                 st.markdown("### Numeric Columns Statistics")
-                st.dataframe(data[numeric_cols].describe(), use_container_width=True)
+                st.dataframe(summary_stats['numeric'], use_container_width=True)
         
         # Dashboard components section
         if report_config['include_charts'] and dashboard_config:
             st.markdown("## 📈 Visualizations")
             
-            from utils.visualization import Visualization
-            viz = Visualization()
+            from utils.visualization import get_visualization
+            viz = get_visualization()
             
             for i, component in enumerate(dashboard_config):
                 st.markdown(f"### {component.get('title', f'Component {i+1}')}")
@@ -151,7 +213,9 @@ class ReportGenerator:
                             component['config']
                         )
                         if fig:
-                            st.plotly_chart(fig, use_container_width=True)
+                            # The preview is read-only, so skip Plotly's
+                            # interaction layer (hover, zoom, mode bar)
+                            st.plotly_chart(fig, use_container_width=True, config={'staticPlot': True})
                     except Exception as e:
                         st.error(f"Error displaying chart: {str(e)}")
                 
@@ -162,19 +226,7 @@ class ReportGenerator:
                         aggregation = config.get('aggregation', 'sum')
                         
                         if column and column in data.columns:
-                            if aggregation == 'sum':
-                                value = data[column].sum()
-                            elif aggregation == 'mean':
-                                value = data[column].mean()
-                            elif aggregation == 'count':
-                                value = data[column].count()
-                            elif aggregation == 'min':
-                                value = data[column].min()
-                            elif aggregation == 'max':
-                                value = data[column].max()
-                            elif aggregation == 'median':
-                                value = data[column].median()
-                            
+                            value = get_metric_value(data, column, aggregation)
                             st.metric(component['title'], f"{value:,.2f}")
                     except Exception as e:
                         st.error(f"Error displaying metric: {str(e)}")
@@ -191,16 +243,26 @@ class ReportGenerator:
                     except Exception as e:
                         st.error(f"Error displaying table: {str(e)}")
     
+    def _column_overview(self, data):
+        """Type, non-null and unique counts per column for the report"""
+        # Derived from the cached whole-frame column info rather than a
+        # count() and nunique() pass per column
+        column_info = self.data_processor.get_column_info(data)
+        return pd.DataFrame({
+            'Column': column_info['Column'],
+            'Type': column_info['Type'],
+            'Non-Null Count': len(data) - column_info['Null Count'],
+            'Unique Values': column_info['Unique Values']
+        })
+    
     def _export_csv(self, data):
         """Export data as CSV"""
         try:
-            csv_buffer = BytesIO()
-            data.to_csv(csv_buffer, index=False)
-            csv_buffer.seek(0)
-            
+            # Serialized on click, off the script thread, through the same
+            # cache as the app's other CSV downloads
             st.download_button(
                 label="⬇️ Download CSV",
-                data=csv_buffer.getvalue(),
+                data=partial(self.data_processor.to_csv_bytes, data),
                 file_name=f"data_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
                 mime="text/csv"
             )
@@ -210,9 +272,33 @@ class ReportGenerator:
         except Exception as e:
             st.error(f"❌ Error exporting CSV: {str(e)}")
     
+    def _export_parquet(self, data):
+        """Export data as Parquet"""
+        try:
+            # The file is written on click, where errors can't be reported, so
+            # columns Arrow can't store (mixed-type objects, duplicate names)
+            # are caught here by inferring the schema it would write
+            pyarrow.Schema.from_pandas(data, preserve_index=False)
+            
+            # Columnar and compressed: much smaller and faster to write than
+            # CSV for numeric tables, and serialized on click like the CSV
+            st.download_button(
+                label="⬇️ Download Parquet",
+                data=partial(_parquet_bytes, data),
+                file_name=f"data_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.parquet",
+                mime="application/vnd.apache.parquet"
+            )
+            
+            st.success("✅ Parquet export ready for download!")
+            
+        except Exception as e:
+            st.error(f"❌ Error exporting Parquet: {str(e)}")
+    
     def _export_json_summary(self, data, dashboard_config):
         """Export summary information as JSON"""
         try:
+            frame_summary = self.data_processor.get_frame_summary(data)
+            numeric_summary = self.data_processor.get_summary_stats(data).get('numeric')
             summary = {
                 'export_info': {
                     'generated_at': datetime.now().isoformat(),
@@ -221,18 +307,17 @@ class ReportGenerator:
                 'data_summary': {
                     'shape': data.shape,
                     'columns': data.columns.tolist(),
-                    'dtypes': data.dtypes.astype(str).to_dict(),
-                    'missing_values': data.isnull().sum().to_dict(),
-                    'numeric_summary': data.describe().to_dict() if len(data.select_dtypes(include=['number']).columns) > 0 else {}
+                    'dtypes': frame_summary['dtypes'].to_dict(),
+                    'missing_values': frame_summary['missing'].to_dict(),
+                    'numeric_summary': numeric_summary.to_dict() if numeric_summary is not None else {}
                 },
                 'dashboard_config': dashboard_config
             }
             
-            json_str = json.dumps(summary, indent=2, default=str)
-            
+            # Serialized on click like the data exports
             st.download_button(
                 label="⬇️ Download JSON Summary",
-                data=json_str,
+                data=partial(_summary_json, summary),
                 file_name=f"analysis_summary_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
                 mime="application/json"
             )
@@ -248,17 +333,24 @@ class ReportGenerator:
             st.error("❌ python-docx library not available for DOCX export")
             return
         
-        try:
+        # The summary figures come from the per-frame caches, which live in
+        # session state, so they're read here; the document itself is only
+        # built when the user clicks download, off the script thread
+        if report_config['include_summary']:
+            missing_count = self.data_processor.get_frame_summary(data)['total_missing']
+            column_overview = self._column_overview(data)
+        
+        def build_document():
             # Create document
             doc = Document()
             
             # Add title
-            title = doc.add_heading(report_config['title'], 0)
+            title = doc.add_heading(_xml_text(report_config['title']), 0)
             
             # Add metadata
-            doc.add_paragraph(f"Author: {report_config['author']}")
+            doc.add_paragraph(_xml_text(f"Author: {report_config['author']}"))
             doc.add_paragraph(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M')}")
-            doc.add_paragraph(f"Description: {report_config['description']}")
+            doc.add_paragraph(_xml_text(f"Description: {report_config['description']}"))
             
             # Add data summary
             if report_config['include_summary']:
@@ -267,7 +359,6 @@ class ReportGenerator:
                 # Basic statistics
                 doc.add_paragraph(f"Dataset contains {data.shape[0]:,} rows and {data.shape[1]} columns.")
                 
-                missing_count = data.isnull().sum().sum()
                 doc.add_paragraph(f"Total missing values: {missing_count:,}")
                 
                 # Column information
@@ -284,34 +375,31 @@ class ReportGenerator:
                 header_cells[2].text = 'Non-Null Count'
                 header_cells[3].text = 'Unique Values'
                 
-                # Add data rows
-                for col in data.columns:
-                    row_cells = table.add_row().cells
-                    row_cells[0].text = col
-                    row_cells[1].text = str(data[col].dtype)
-                    row_cells[2].text = str(data[col].count())
-                    row_cells[3].text = str(data[col].nunique())
+                # Add data rows, stringified as whole columns rather than
+                # one str() call per cell
+                _append_text_rows(table, column_overview.astype(str).to_numpy().tolist())
             
             # Add dashboard information
             if dashboard_config:
                 doc.add_heading('Dashboard Components', level=1)
                 
                 for i, component in enumerate(dashboard_config):
-                    doc.add_heading(f"{component.get('title', f'Component {i+1}')}", level=2)
-                    doc.add_paragraph(f"Type: {component['type']}")
+                    doc.add_heading(_xml_text(f"{component.get('title', f'Component {i+1}')}"), level=2)
+                    doc.add_paragraph(_xml_text(f"Type: {component['type']}"))
                     
                     if component['type'] == 'chart':
-                        doc.add_paragraph(f"Chart Type: {component.get('chart_type', 'N/A')}")
+                        doc.add_paragraph(_xml_text(f"Chart Type: {component.get('chart_type', 'N/A')}"))
                         doc.add_paragraph(f"Configuration: {json.dumps(component.get('config', {}), indent=2)}")
             
             # Save to BytesIO
             doc_buffer = BytesIO()
             doc.save(doc_buffer)
-            doc_buffer.seek(0)
-            
+            return doc_buffer.getvalue()
+        
+        try:
             st.download_button(
                 label="⬇️ Download DOCX Report",
-                data=doc_buffer.getvalue(),
+                data=build_document,
                 file_name=f"analysis_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.docx",
                 mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
             )
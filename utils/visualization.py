@@ -1,7 +1,46 @@
 import plotly.express as px
 import plotly.graph_objects as go
 import pandas as pd
+import numpy as np
 import streamlit as st
+import json
+import warnings
+import weakref
+from collections import OrderedDict
+
+# Figures kept per session, least recently used dropped first
+_MAX_CACHED_FIGURES = 16
+
+# Points sent to the browser for line, area and scatter charts: Plotly
+# draws every point client-side, and past this the payload and rendering
+# grow without adding anything visible
+_MAX_PLOT_POINTS = 10_000
+
+
+def _thin_series_rows(df, y_col, color_col):
+    """Cut a line or area chart's rows to about _MAX_PLOT_POINTS, keeping row order"""
+    n = len(df)
+    if n <= _MAX_PLOT_POINTS:
+        return df
+    
+    y = df[y_col]
+    if color_col or not pd.api.types.is_numeric_dtype(y):
+        # Several series interleave their rows, so keep every step-th row
+        return df.iloc[::-(-n // _MAX_PLOT_POINTS)]
+    
+    # Keep the lowest and highest point of each run of consecutive rows, so
+    # peaks and dips survive where plain striding would skip them
+    buckets = _MAX_PLOT_POINTS // 2
+    size = -(-n // buckets)
+    values = np.full(buckets * size, np.nan)
+    values[:n] = y.to_numpy(dtype=float, na_value=np.nan)
+    values = values.reshape(buckets, size)
+    offsets = np.arange(buckets) * size
+    missing = np.isnan(values)
+    lows = np.where(missing, np.inf, values).argmin(axis=1) + offsets
+    highs = np.where(missing, -np.inf, values).argmax(axis=1) + offsets
+    rows = np.union1d(lows, highs)
+    return df.iloc[rows[rows < n]]
 
 class Visualization:
     """Handles creation of various chart types using Plotly"""
@@ -17,21 +56,41 @@ class Visualization:
             'Heatmap': self.create_heatmap,
             'Area Chart': self.create_area_chart
         }
+        self._chart_names = list(self.chart_types.keys())
     
     def get_available_charts(self):
         """Return list of available chart types"""
-        return list(self.chart_types.keys())
+        return self._chart_names
     
     def create_chart(self, chart_type, df, config):
         """Create chart based on type and configuration"""
         if chart_type not in self.chart_types:
             raise ValueError(f"Unsupported chart type: {chart_type}")
         
+        # Building a Plotly figure is far slower than copying it, so reuse it
+        # across reruns while the frame object and full configuration are
+        # unchanged. Frames are held by weak reference: figures for data
+        # that has been replaced are dropped rather than keeping it alive.
+        figures = st.session_state.setdefault('_chart_figures', OrderedDict())
+        key = (id(df), chart_type, json.dumps(config, sort_keys=True, default=str))
+        cached = figures.get(key)
+        if cached is not None and cached[0]() is df:
+            figures.move_to_end(key)
+            # A copy, so a caller changing its figure can't alter the others
+            return go.Figure(cached[1])
+        
         try:
-            return self.chart_types[chart_type](df, config)
+            fig = self.chart_types[chart_type](df, config)
         except Exception as e:
             st.error(f"Error creating {chart_type}: {str(e)}")
             return None
+        
+        figures[key] = (weakref.ref(df), fig)
+        for stale in [k for k, (frame, _) in figures.items() if frame() is None]:
+            del figures[stale]
+        while len(figures) > _MAX_CACHED_FIGURES:
+            figures.popitem(last=False)
+        return go.Figure(fig)
     
     def create_line_chart(self, df, config):
         """Create line chart"""
@@ -43,7 +102,7 @@ class Visualization:
             raise ValueError("X and Y columns are required for line chart")
         
         fig = px.line(
-            df, 
+            _thin_series_rows(df, y_col, color_col),
             x=x_col, 
             y=y_col,
             color=color_col if color_col else None,
@@ -81,6 +140,11 @@ class Visualization:
         if not x_col or not y_col:
             raise ValueError("X and Y columns are required for scatter plot")
         
+        # Scatter points have no order to preserve, so a fixed random sample
+        # keeps the shape of the cloud
+        if len(df) > _MAX_PLOT_POINTS:
+            df = df.sample(n=_MAX_PLOT_POINTS, random_state=0)
+        
         fig = px.scatter(
             df,
             x=x_col,
@@ -137,8 +201,9 @@ class Visualization:
         if not values_col or not names_col:
             raise ValueError("Values and names columns are required for pie chart")
         
-        # Aggregate data if needed
-        pie_data = df.groupby(names_col)[values_col].sum().reset_index()
+        # Aggregate data if needed; px.pie orders slices by value itself, so
+        # the groups don't need sorting by name first
+        pie_data = df.groupby(names_col, sort=False, observed=True, as_index=False)[values_col].sum()
         
         fig = px.pie(
             pie_data,
@@ -156,7 +221,17 @@ class Visualization:
         if len(numeric_cols) < 2:
             raise ValueError("At least 2 numeric columns are required for heatmap")
         
-        correlation_matrix = df[numeric_cols].corr()
+        # With no missing values pandas' pairwise-complete loop isn't needed,
+        # and NumPy's corrcoef does the whole matrix as one matrix product
+        values = df[numeric_cols].to_numpy(dtype=float, na_value=np.nan)
+        if np.isnan(values).any():
+            correlation_matrix = df[numeric_cols].corr()
+        else:
+            with warnings.catch_warnings():
+                # Constant columns have no correlation and come out NaN, as in pandas
+                warnings.simplefilter('ignore', RuntimeWarning)
+                correlation = np.corrcoef(values, rowvar=False)
+            correlation_matrix = pd.DataFrame(correlation, index=numeric_cols, columns=numeric_cols)
         
         fig = px.imshow(
             correlation_matrix,
@@ -177,7 +252,7 @@ class Visualization:
             raise ValueError("X and Y columns are required for area chart")
         
         fig = px.area(
-            df,
+            _thin_series_rows(df, y_col, color_col),
             x=x_col,
             y=y_col,
             color=color_col if color_col else None,
@@ -194,50 +269,73 @@ class Visualization:
             'delta': delta
         }
     
+    def get_column_groups(self, df):
+        """Get the numeric, categorical and datetime column names, computed once per DataFrame"""
+        # Every chart component asks on every rerun, so reuse the groups while
+        # the same frame object is current (weakly held, as in _per_frame)
+        cached = st.session_state.get('_column_groups')
+        if cached is not None and cached[0]() is df:
+            return cached[1]
+        
+        groups = {
+            'numeric': df.select_dtypes(include=['number']).columns.tolist(),
+            'categorical': df.select_dtypes(include=['object']).columns.tolist(),
+            'datetime': df.select_dtypes(include=['datetime64']).columns.tolist()
+        }
+        st.session_state['_column_groups'] = (weakref.ref(df), groups)
+        return groups
+    
     def get_suitable_columns(self, df, chart_type):
         """Get columns suitable for specific chart type"""
-        numeric_cols = df.select_dtypes(include=['number']).columns.tolist()
-        categorical_cols = df.select_dtypes(include=['object']).columns.tolist()
-        datetime_cols = df.select_dtypes(include=['datetime64']).columns.tolist()
+        groups = self.get_column_groups(df)
+        numeric_cols = groups['numeric']
+        categorical_cols = groups['categorical']
+        datetime_cols = groups['datetime']
         
-        recommendations = {
-            'Line Chart': {
+        # Only the requested chart's entry is built
+        if chart_type in ('Line Chart', 'Area Chart'):
+            return {
                 'x_column': datetime_cols + numeric_cols + categorical_cols,
                 'y_column': numeric_cols,
                 'color_column': categorical_cols
-            },
-            'Bar Chart': {
+            }
+        elif chart_type == 'Bar Chart':
+            return {
                 'x_column': categorical_cols + numeric_cols,
                 'y_column': numeric_cols,
                 'color_column': categorical_cols
-            },
-            'Scatter Plot': {
+            }
+        elif chart_type == 'Scatter Plot':
+            return {
                 'x_column': numeric_cols,
                 'y_column': numeric_cols,
                 'color_column': categorical_cols,
                 'size_column': numeric_cols
-            },
-            'Histogram': {
+            }
+        elif chart_type == 'Histogram':
+            return {
                 'x_column': numeric_cols,
                 'color_column': categorical_cols
-            },
-            'Box Plot': {
+            }
+        elif chart_type == 'Box Plot':
+            return {
                 'x_column': categorical_cols,
                 'y_column': numeric_cols,
                 'color_column': categorical_cols
-            },
-            'Pie Chart': {
+            }
+        elif chart_type == 'Pie Chart':
+            return {
                 'values_column': numeric_cols,
                 'names_column': categorical_cols
-            },
-            'Heatmap': {
+            }
+        elif chart_type == 'Heatmap':
+            return {
                 'suitable': len(numeric_cols) >= 2
-            },
-            'Area Chart': {
-                'x_column': datetime_cols + numeric_cols + categorical_cols,
-                'y_column': numeric_cols,
-                'color_column': categorical_cols
             }
-        }
-        
-        return recommendations.get(chart_type, {})
+        return {}
+
+
+@st.cache_resource(show_spinner=False)
+def get_visualization():
+    """Get the shared Visualization; it holds no per-session state"""
+    return Visualization()